@@ -0,0 +1,333 @@
+"""
+End-to-end benchmark of every pipeline stage over a recorded cassette (see http_cassette.py).
+
+Usage:
+    python .github/actions/run_pipeline.py --record bench_cassette     # once, with network
+    python .github/actions/bench_pipeline.py bench_cassette [--repeat 3] [--output bench.json]
+        [--compare baseline.json] [--threshold 0.10]
+
+Each repeat copies the scripts, README.md and the latest_*_files directories into a temporary tree
+and runs the stages there one after another, each in its own process replaying the cassette, so the
+repository is never modified and every repeat sees identical inputs.
+
+Per stage it reports wall time, CPU time, peak RSS, bytes written and a split of the wall time into
+fetch / parse / serialize_xml / serialize_json / serialize_yaml / write, with "transform" being the
+rest. Medians over the repeats are written to --output. With --compare, the run exits 1 when a
+stage's wall time, CPU time or peak memory is worse than the baseline by more than --threshold.
+"""
+import argparse
+import builtins
+import inspect
+import json
+import os
+import platform
+import plistlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from xml.dom import minidom
+
+import requests
+import yaml
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+sys.path.insert(0, SCRIPT_DIR)
+
+import serializers
+import stream_writers
+import xml_writer
+from run_pipeline import STAGES, run_stage
+
+# Entry points whose time is attributed to each phase (innermost phase wins when nested).
+# The generators serialize through serializers, stream_writers' document generators and
+# xml_writer, and write every output through stream_writers; the library functions behind
+# them are listed too for the code that still calls them directly.
+PHASE_TARGETS = {
+    "fetch": [(requests.Session, "send")],
+    "parse": [
+        (json, "load"), (json, "loads"), (yaml, "load"), (yaml, "safe_load"),
+        (ET, "parse"), (ET, "fromstring"), (ET, "XML"), (minidom, "parse"), (minidom, "parseString"),
+        (plistlib, "load"), (plistlib, "loads"),
+    ],
+    "serialize_json": [(json, "dump"), (json, "dumps"), (serializers, "dump_json"), (stream_writers, "iter_json_document")],
+    "serialize_yaml": [(yaml, "dump"), (yaml, "safe_dump"), (yaml, "dump_all"), (serializers, "dump_yaml"), (stream_writers, "iter_yaml_document")],
+    "serialize_xml": [
+        (ET, "tostring"), (ET.ElementTree, "write"), (minidom.Node, "toprettyxml"), (minidom.Node, "toxml"),
+        (xml_writer, "pretty_xml"), (xml_writer, "iter_pretty_xml"),
+    ],
+    "write": [(stream_writers, "write_stream"), (stream_writers, "matches_file"), (stream_writers, "patch_stream")],
+}
+PHASES = ["fetch", "parse", "transform", "serialize_xml", "serialize_json", "serialize_yaml", "write"]
+COMPARED_METRICS = ["wall_s", "cpu_s", "peak_rss_mb"]
+# Differences below these are treated as noise whatever the relative change
+NOISE_FLOOR = {"wall_s": 0.05, "cpu_s": 0.05, "peak_rss_mb": 2.0}
+
+class PhaseTimer:
+    """Records exclusive (innermost) time segments per phase for every thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.segments = {phase: [] for phase in PHASES}
+
+    def _emit(self, phase, start, end):
+        with self._lock:
+            self.segments[phase].append((start, end))
+
+    def enter(self, phase):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        now = time.perf_counter()
+        if stack:
+            self._emit(stack[-1], self._local.since, now)
+        stack.append(phase)
+        self._local.since = now
+
+    def exit(self):
+        now = time.perf_counter()
+        self._emit(self._local.stack.pop(), self._local.since, now)
+        self._local.since = now
+
+    def wrap(self, func, phase):
+        if inspect.isgeneratorfunction(func):
+            # Time the work done for each item, not just the call that creates the generator
+            def timed(*args, **kwargs):
+                items = func(*args, **kwargs)
+                while True:
+                    self.enter(phase)
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    finally:
+                        self.exit()
+                    yield item
+        else:
+            def timed(*args, **kwargs):
+                self.enter(phase)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.exit()
+        timed.__name__ = getattr(func, "__name__", "timed")
+        timed.__doc__ = getattr(func, "__doc__", None)
+        return timed
+
+    def install(self):
+        for phase, targets in PHASE_TARGETS.items():
+            for owner, name in targets:
+                original = getattr(owner, name)
+                timed = self.wrap(original, phase)
+                setattr(owner, name, timed)
+                # Scripts that already did `from owner import name` hold the original
+                for module in list(sys.modules.values()):
+                    if (os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or "")) == SCRIPT_DIR
+                            and getattr(module, name, None) is original):
+                        setattr(module, name, timed)
+        real_open = builtins.open
+        timer = self
+
+        def timed_open(file, mode="r", *args, **kwargs):
+            f = real_open(file, mode, *args, **kwargs)
+            return TimedFile(f, timer) if any(c in mode for c in "wax+") else f
+        builtins.open = timed_open
+
+    def totals(self, wall):
+        """Wall seconds per phase (overlapping threads counted once); transform is the remainder."""
+        totals = {phase: union_length(segments) for phase, segments in self.segments.items()}
+        covered = union_length([s for phase, segments in self.segments.items() for s in segments if phase != "transform"])
+        totals["transform"] = max(wall - covered, 0.0)
+        return totals
+
+class TimedFile:
+    """File wrapper that attributes write() time to the write phase."""
+
+    def __init__(self, f, timer):
+        self._f = f
+        self._timer = timer
+
+    def write(self, data):
+        self._timer.enter("write")
+        try:
+            return self._f.write(data)
+        finally:
+            self._timer.exit()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def close(self):
+        self._timer.enter("write")
+        try:
+            self._f.close()
+        finally:
+            self._timer.exit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+def union_length(segments):
+    total = 0.0
+    covered_to = float("-inf")
+    for start, end in sorted(segments):
+        if end <= covered_to:
+            continue
+        total += end - max(start, covered_to)
+        covered_to = end
+    return total
+
+def worker(stage, result_path):
+    """Run one stage in this process with phase timing installed and write the measurements."""
+    timer = PhaseTimer()
+    timer.install()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    result = run_stage(stage)
+    wall = time.perf_counter() - start
+    measurement = {
+        "wall_s": wall,
+        "cpu_s": time.process_time() - cpu_start,
+        "phases": timer.totals(wall),
+        "error": result["error"],
+    }
+    with builtins.open(result_path, "w") as f:
+        json.dump(measurement, f)
+
+def prepare_tree(root):
+    """Copy the scripts and current outputs so stages see the same inputs as in the repository."""
+    shutil.copytree(SCRIPT_DIR, os.path.join(root, ".github", "actions"), ignore=shutil.ignore_patterns("__pycache__"))
+    for name in os.listdir(REPO_ROOT):
+        path = os.path.join(REPO_ROOT, name)
+        if name.startswith("latest_") and os.path.isdir(path):
+            shutil.copytree(path, os.path.join(root, name))
+    if os.path.exists(os.path.join(REPO_ROOT, "README.md")):
+        shutil.copy2(os.path.join(REPO_ROOT, "README.md"), os.path.join(root, "README.md"))
+
+def files_written_since(root, since_ns):
+    count = 0
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in (".cache", ".github")]
+        for filename in filenames:
+            stat = os.stat(os.path.join(dirpath, filename))
+            if stat.st_mtime_ns >= since_ns:
+                count += 1
+                size += stat.st_size
+    return count, size
+
+def run_worker(root, stage, cassette, verbose=False):
+    result_path = os.path.join(root, f".bench_{stage}.json")
+    env = dict(os.environ, BOFA_REPLAY_DIR=os.path.abspath(cassette))
+    env.pop("BOFA_RECORD_DIR", None)
+    output = None if verbose else subprocess.DEVNULL
+    since_ns = time.time_ns()
+    script = os.path.join(root, ".github", "actions", os.path.basename(__file__))
+    proc = subprocess.Popen([sys.executable, script, "--worker", stage, result_path], cwd=root, env=env, stdout=output, stderr=output)
+    # wait4 gives the child's own resource usage, including its peak RSS
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        return {"wall_s": 0.0, "cpu_s": 0.0, "phases": {}, "error": f"worker exited with {proc.returncode}", "peak_rss_mb": peak / (1024 * 1024), "files_written": 0, "bytes_written": 0}
+    with open(result_path, "r") as f:
+        measurement = json.load(f)
+    os.remove(result_path)
+    measurement["files_written"], measurement["bytes_written"] = files_written_since(root, since_ns)
+    measurement["peak_rss_mb"] = peak / (1024 * 1024)
+    return measurement
+
+def summarize(runs):
+    """Median of each metric over the repeats of one stage."""
+    summary = {metric: statistics.median(run[metric] for run in runs) for metric in ["wall_s", "cpu_s", "peak_rss_mb", "files_written", "bytes_written"]}
+    summary["phases"] = {phase: statistics.median(run["phases"].get(phase, 0.0) for run in runs) for phase in PHASES}
+    summary["errors"] = sorted({run["error"] for run in runs if run["error"]})
+    return summary
+
+def run_benchmark(cassette, repeat, verbose=False):
+    runs = {stage: [] for stage in STAGES}
+    for i in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="bofa-bench-") as root:
+            prepare_tree(root)
+            for stage in STAGES:
+                runs[stage].append(run_worker(root, stage, cassette, verbose))
+        print(f"Repeat {i + 1}/{repeat} done")
+    return {stage: summarize(stage_runs) for stage, stage_runs in runs.items()}
+
+def print_results(stages):
+    print()
+    print(f"{'Stage':<8} {'Wall':>8} {'CPU':>8} {'Peak RSS':>10} {'Written':>10}  Phases")
+    for stage, s in stages.items():
+        phases = "  ".join(f"{phase} {seconds:.3f}" for phase, seconds in s["phases"].items() if seconds >= 0.0005)
+        print(f"{stage:<8} {s['wall_s']:7.3f}s {s['cpu_s']:7.3f}s {s['peak_rss_mb']:8.1f}MB {s['bytes_written'] / 1024:8.0f}KB  {phases}")
+        for error in s["errors"]:
+            print(f"         error: {error}")
+
+def compare(stages, baseline_path, threshold):
+    """Print regressions against a previous results file; returns True if any were found."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)["stages"]
+    regressed = False
+    for stage, s in stages.items():
+        for metric in COMPARED_METRICS:
+            before = baseline.get(stage, {}).get(metric)
+            if before is None:
+                continue
+            after = s[metric]
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR[metric]:
+                print(f"REGRESSION {stage} {metric}: {before:.3f} -> {after:.3f} (+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+                regressed = True
+    if not regressed:
+        print(f"No regressions beyond {threshold * 100:.0f}% against {baseline_path}")
+    return regressed
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], sys.argv[3])
+        return
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage over a recorded cassette.")
+    parser.add_argument("cassette", help="cassette directory recorded with run_pipeline.py --record")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; medians are reported (default 3)")
+    parser.add_argument("--output", default="bench_results.json", help="results file (default bench_results.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file from an earlier commit to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown before failing (default 0.10)")
+    parser.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    args = parser.parse_args()
+    if not os.path.isdir(args.cassette):
+        parser.error(f"cassette directory {args.cassette} does not exist")
+
+    stages = run_benchmark(args.cassette, args.repeat, args.verbose)
+    print_results(stages)
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cassette": os.path.abspath(args.cassette),
+        "repeat": args.repeat,
+        "stages": stages,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare and compare(stages, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare peak memory and time of the Safari catalog ingestion before and after streaming.
+
+Usage:
+    python .github/actions/bench_safari_catalog.py [path/to/catalog.sucatalog.gz]
+
+Without a path a synthetic catalog (mostly non-Safari products, like the real one) is generated.
+"""
+import gzip
+import os
+import plistlib
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_safari_latest import iter_safari_products
+
+def synthetic_catalog(products=20000, safari_every=500):
+    catalog = {"CatalogVersion": 2, "ApplePostURL": "http://example.invalid/", "Products": {}}
+    for i in range(products):
+        product = {
+            "Packages": [{"URL": f"https://swcdn.example/{i}/Package{i}.pkg", "Size": 1000000 + i, "MetadataURL": f"https://swcdn.example/{i}/Package{i}.smd"}],
+            "PostDate": datetime(2024, 1, 1 + i % 28, 12, 0, 0),
+            "Distributions": {"English": f"https://swcdn.example/{i}/{i}.English.dist"},
+            "ServerMetadataURL": f"https://swcdn.example/{i}/{i}.smd",
+        }
+        if i % safari_every == 0:
+            product["ExtendedMetaInfo"] = {"ProductType": "Safari", "ProductVersion": f"18.{i % 7}"}
+            product["Packages"][0]["URL"] = f"https://swcdn.example/{i}/Safari18.{i % 7}SonomaAuto.pkg"
+        catalog["Products"][f"{i:03d}-{i:05d}"] = product
+    return gzip.compress(plistlib.dumps(catalog))
+
+def legacy_ingest(data):
+    catalog = plistlib.loads(gzip.decompress(data))
+    return [
+        (product_id, info) for product_id, info in catalog["Products"].items()
+        if info.get("ExtendedMetaInfo", {}).get("ProductType") == "Safari"
+    ]
+
+def streaming_ingest(data, chunk_size=64 * 1024):
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return list(iter_safari_products(chunks))
+
+def measure(name, func, data):
+    # Time without tracing (tracemalloc slows allocation-heavy code), then trace a second run for the peak
+    start = time.perf_counter()
+    result = func(data)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} {elapsed * 1000:9.1f} ms   peak {peak / (1024 * 1024):8.2f} MB   {len(result)} Safari products")
+    return result
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_catalog()
+    print(f"Catalog: {len(data) / (1024 * 1024):.2f} MB compressed")
+    before = measure("before", legacy_ingest, data)
+    after = measure("after", streaming_ingest, data)
+    if before != after:
+        print("WARNING: streaming result differs from plistlib result")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Time the history writers with the pure-Python serializers and with the accelerated backends.
+
+Usage:
+    python .github/actions/bench_serializers.py [--repeat N] [history.json ...]
+
+Each {..., "releases": [...]} history file (by default every *_history.json in the
+latest_*_files directories) is loaded and serialized to JSON and YAML through stream_writers,
+as the generators do, once with serializers.ACCELERATED off and once with it on. Prints the best time of each and the speedup,
+and exits with status 1 if the two outputs differ.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import serializers
+from stream_writers import iter_json_document, iter_yaml_document
+
+FORMATS = {
+    "json": lambda header, releases: "".join(iter_json_document(header, "releases", releases)),
+    "yaml": lambda header, releases: "".join(iter_yaml_document(header, "releases", releases)),
+}
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"orjson: {'yes' if serializers.orjson else 'not installed'}, libyaml: {'yes' if yaml.__with_libyaml__ else 'not available'}")
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    paths = args.paths or sorted(glob.glob(os.path.join(root_dir, "latest_*_files", "*_history.json")))
+    totals = {name: [0.0, 0.0] for name in FORMATS}
+    print(f"{'file':<36} {'format':<6} {'pure':>9} {'fast':>9} {'speedup':>8}")
+    for path in paths:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "releases" not in data:
+            continue
+        releases = data.pop("releases")
+        for name, serialize in FORMATS.items():
+            serializers.ACCELERATED = False
+            pure, expected = best_time(lambda: serialize(data, releases), args.repeat)
+            serializers.ACCELERATED = True
+            fast, actual = best_time(lambda: serialize(data, releases), args.repeat)
+            if actual != expected:
+                print(f"{path}: accelerated {name} output differs")
+                sys.exit(1)
+            totals[name][0] += pure
+            totals[name][1] += fast
+            print(f"{os.path.basename(path):<36} {name:<6} {pure * 1000:7.1f}ms {fast * 1000:7.1f}ms {pure / fast:7.1f}x")
+    for name, (pure, fast) in totals.items():
+        if fast:
+            print(f"{'total':<36} {name:<6} {pure * 1000:7.1f}ms {fast * 1000:7.1f}ms {pure / fast:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytz
+
+from output_manifest import STABLE_OUTPUT, checked_stamp, record_output, recorded_stamp
+from run_report import CURRENT_STAGE, REPORT
+from stream_writers import write_text
+
+# Content-addressed build graph.
+# Every step that turns vendor payloads into output files runs through run_step() with the
+# digests of its inputs (raw payloads, or the files a downstream stage reads). The graph keeps,
+# per stage in .cache/build_graph/<stage>.json, each step's input digests and the digests of
+# the files it wrote. A step whose inputs are identical to the last run, and whose outputs
+# still hold what it wrote, is skipped: no parsing, conversion, serialization or writing.
+# The generators' own code is an input of every step, so a code change rebuilds everything.
+# Skipping a step leaves the last_updated embedded in its outputs as it was, which is what
+# stable-output mode promises (see output_manifest), so steps are only skipped in that mode;
+# BOFA_FULL_BUILD=1 runs every step anyway.
+
+GRAPH_DIR = os.path.join(".cache", "build_graph")
+ENABLED = STABLE_OUTPUT and os.environ.get("BOFA_FULL_BUILD", "").lower() not in ("1", "true", "yes")
+
+_graph_lock = threading.Lock()
+_code_digest = None
+
+def digest(data):
+    """sha256 hex digest of bytes, text, or JSON-serializable data."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    elif not isinstance(data, bytes):
+        data = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def file_digest(path):
+    """sha256 hex digest of a file's bytes, or None if it does not exist."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+def code_digest():
+    """Digest of every script in this directory."""
+    global _code_digest
+    if _code_digest is None:
+        scripts = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")))
+        _code_digest = digest({os.path.basename(path): file_digest(path) for path in scripts})
+    return _code_digest
+
+def _graph_path():
+    return os.path.join(GRAPH_DIR, f"{CURRENT_STAGE.get() or 'main'}.json")
+
+def _load_graph(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _run_time():
+    return datetime.now(pytz.timezone("US/Eastern")).strftime("%B %d, %Y %I:%M %p %Z")
+
+def is_fresh(name, inputs, outputs):
+    """
+    True if step name last ran on exactly these inputs and its outputs are unchanged since.
+    """
+    with _graph_lock:
+        recorded = _load_graph(_graph_path()).get(name)
+    if not recorded or recorded["inputs"] != inputs or sorted(recorded["outputs"]) != sorted(outputs):
+        return False
+    return all(file_digest(path) == recorded["outputs"][path] for path in outputs)
+
+def run_step(name, inputs, outputs, build):
+    """
+    Call build() to (re)write outputs (file paths) from inputs ({label: digest}), unless the
+    build graph says they are up to date. Returns True if build ran.
+    """
+    inputs = dict(inputs, code=code_digest())
+    if ENABLED and is_fresh(name, inputs, outputs):
+        run_time = _run_time()
+        for path in outputs:
+            if os.path.exists(path):
+                REPORT.record_write(path, os.path.getsize(path), written=False)
+            stamp = recorded_stamp(path)
+            if stamp:
+                record_output(path, stamp, run_time)
+        REPORT.record_step(name, built=False)
+        print(f"{name}: inputs unchanged, skipped")
+        return False
+    checked = {path: checked_stamp(path) for path in outputs}
+    build()
+    REPORT.record_step(name, built=True)
+    if ENABLED:
+        run_time = _run_time()
+        for path in outputs:
+            # Files the step wrote without going through the manifest embed this run's time
+            if os.path.exists(path) and checked_stamp(path) == checked[path]:
+                record_output(path, run_time, run_time)
+        path = _graph_path()
+        with _graph_lock:
+            graph = _load_graph(path)
+            graph[name] = {"inputs": inputs, "outputs": {output: file_digest(output) for output in outputs}}
+            os.makedirs(GRAPH_DIR, exist_ok=True)
+            write_text(path, json.dumps(graph, indent=2, sort_keys=True))
+    return True
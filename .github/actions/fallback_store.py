@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from resilience import CURRENT_DEADLINE, RETRY_STATUSES, Deadline
+from run_report import REPORT
+
+# Last-known-good payload store (stale-while-revalidate).
+# The body of every successful GET is kept per endpoint in .cache/last_good (saved between runs
+# with the rest of .cache). When an endpoint has a stored payload, its live request gets a latency
+# budget: if the request fails, returns a retryable error status, or is still going when the
+# budget runs out, the stored payload is served at once as a normal 200 response (stale = True)
+# and the run report lists it under "stale". Nothing else is needed to revalidate: the next run
+# asks the vendor again, and a good answer replaces the stored payload.
+# Entries no run has fetched or served for LAST_GOOD_MAX_AGE are removed.
+# Replays (BOFA_REPLAY_DIR, see http_cassette.py) neither use nor update the store, so they stay
+# deterministic and a response missing from the cassette fails the run instead of being hidden.
+
+LAST_GOOD_DIR = os.environ.get("BOFA_LAST_GOOD_DIR", os.path.join(os.getcwd(), ".cache", "last_good"))
+# Seconds a live request may take (retries included) before the stored payload is served instead
+LATENCY_BUDGET = float(os.environ.get("BOFA_LATENCY_BUDGET", 20))
+LAST_GOOD_MAX_AGE = 14 * 24 * 3600
+
+_lock = threading.Lock()
+_pruned = False
+
+def fallback_enabled():
+    """False while replaying a cassette; checked per call since run_pipeline sets it after import."""
+    return not os.environ.get("BOFA_REPLAY_DIR")
+
+def _paths(key):
+    return os.path.join(LAST_GOOD_DIR, f"{key}.json"), os.path.join(LAST_GOOD_DIR, f"{key}.body")
+
+def load_payload(key):
+    """Return (metadata, body) of the stored payload for a key, or (None, None)."""
+    meta_path, body_path = _paths(key)
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+def save_payload(key, url, response, meta=None):
+    """
+    Keep a successful response's body as the endpoint's last good payload.
+    meta: the stored metadata, if any; an unchanged body is not written again.
+    """
+    body = response.content
+    sha = hashlib.sha256(body).hexdigest()
+    meta_path, body_path = _paths(key)
+    fetched_at = time.time()
+    with _lock:
+        os.makedirs(LAST_GOOD_DIR, exist_ok=True)
+        if not meta or meta.get("sha256") != sha or not os.path.exists(body_path):
+            tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+        with open(meta_path, "w") as f:
+            json.dump({"url": url, "headers": dict(response.headers), "sha256": sha,
+                       "size": len(body), "fetched_at": fetched_at, "used_at": fetched_at}, f)
+        _prune_once()
+
+def _touch(key, meta):
+    meta_path, _ = _paths(key)
+    meta["used_at"] = time.time()
+    with _lock:
+        try:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+
+def _prune_once():
+    """Remove entries unused for LAST_GOOD_MAX_AGE, once per process. Caller holds _lock."""
+    global _pruned
+    if _pruned:
+        return
+    _pruned = True
+    cutoff = time.time() - LAST_GOOD_MAX_AGE
+    for name in os.listdir(LAST_GOOD_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(LAST_GOOD_DIR, name), "r") as f:
+                used_at = json.load(f).get("used_at", 0)
+        except (OSError, ValueError):
+            used_at = 0
+        if used_at < cutoff:
+            for path in _paths(name[:-len(".json")]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def stale_response(meta, body, url, reason):
+    """Build a 200 requests.Response serving a stored payload, and note it in the run report."""
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response._content = body
+    response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = meta.get("url", url)
+    response.from_cache = True
+    response.stale = True
+    report_stale(url, reason, meta.get("fetched_at"))
+    return response
+
+def report_stale(url, reason, fetched_at=None):
+    """Note in the run report that url was served from a stored payload fetched at fetched_at (time.time())."""
+    age = None if fetched_at is None else time.time() - fetched_at
+    REPORT.record_stale(url, reason, age)
+    fetched = "" if age is None else f"; fetched {age / 3600:.1f}h ago"
+    print(f"Serving last good payload for {url} ({reason}{fetched})")
+
+def budget_deadline(budget=None):
+    """Deadline for one live request: the latency budget, or the stage's deadline if that comes first."""
+    budget = LATENCY_BUDGET if budget is None else budget
+    stage = CURRENT_DEADLINE.get()
+    if stage is not None:
+        budget = min(budget, stage.remaining())
+    return Deadline(budget)
+
+def get_with_fallback(key, url, fetch):
+    """
+    Call fetch() (a live GET of url) and keep a successful response as the last good payload
+    for key. If one is stored, fetch() runs within the latency budget, and an error, a retryable
+    error status or running out of time serves the stored payload instead.
+    """
+    if not fallback_enabled():
+        return fetch()
+    meta, body = load_payload(key)
+    if meta is None:
+        response = fetch()
+        if response.status_code == 200:
+            save_payload(key, url, response)
+        return response
+    token = CURRENT_DEADLINE.set(budget_deadline())
+    try:
+        response = fetch()
+    except requests.RequestException as e:
+        _touch(key, meta)
+        return stale_response(meta, body, url, f"{type(e).__name__}: {e}")
+    finally:
+        CURRENT_DEADLINE.reset(token)
+    if response.status_code in RETRY_STATUSES:
+        response.close()
+        _touch(key, meta)
+        return stale_response(meta, body, url, f"HTTP {response.status_code}")
+    if response.status_code == 200:
+        save_payload(key, url, response, meta)
+    return response
@@ -1,33 +1,132 @@
-import subprocess
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import itertools
 import json
+from dataclasses import dataclass
 from datetime import datetime
 import os
-import yaml
+from urllib.parse import quote
 from pytz import timezone
+from build_graph import digest, run_step
+from http_client import fetch_text, fetch_many
+from output_manifest import checked_stamp, record_output, recorded_stamp, stable_stamp, write_stable
+from request_coalescer import COALESCER
+from run_report import span
+from serializers import dump_json, dump_yaml
+from stream_writers import iter_json_document, iter_yaml_document, patch_stream, write_text
+from xml_writer import iter_pretty_xml, pretty_xml
 
-def fetch_chrome_versions(channel):
+# Ask versionhistory for large pages so most channels fit in one response
+PAGE_SIZE = 1000
+# Release history is merged into the existing chrome_<channel>_history files, fetching only the
+# newest pages; the first run of each day (or BOFA_CHROME_FULL_HISTORY=1) rebuilds it from every page
+FULL_HISTORY = os.environ.get("BOFA_CHROME_FULL_HISTORY", "").lower() in ("1", "true", "yes")
+
+@dataclass(frozen=True)
+class ChromeRelease:
+    """
+    One release of a channel's history. Parsed once from versionhistory and written as-is
+    to chrome_<channel>_history.json, .yaml and .xml.
+    """
+    version: str
+    release_date: str
+    end_date: str
+    fraction: str
+    # Group number as the API sends it (a string such as "11"), or "N/A"
+    fraction_group: str
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "release_date": self.release_date,
+            "end_date": self.end_date,
+            "fraction": self.fraction,
+            "fraction_group": self.fraction_group,
+        }
+
+def mac_version_url(channel):
+    return f"https://versionhistory.googleapis.com/v1/chrome/platforms/mac/channels/{channel.lower()}/versions/all/releases?filter=endtime=none"
+
+def chrome_history_url(channel):
+    return f"https://versionhistory.googleapis.com/v1/chrome/platforms/mac/channels/{channel}/versions/all/releases"
+
+def page_url(url, page_size, page_token=None):
+    """
+    Add pageSize (and pageToken when continuing) to a versionhistory URL.
+    """
+    separator = "&" if "?" in url else "?"
+    url = f"{url}{separator}pageSize={page_size}"
+    if page_token:
+        url += f"&pageToken={quote(page_token)}"
+    return url
+
+def page_items(page):
     """
-    Fetch Chrome version history for a given channel using the Google Version History API.
+    Return the item list of a versionhistory page ("versions" or "releases").
     """
-    print(f"Fetching Chrome version history for channel: {channel}")
-    url = f"https://versionhistory.googleapis.com/v1/chrome/platforms/mac/channels/{channel}/versions"
-    result = subprocess.run(["curl", url], capture_output=True, text=True)
-    return result.stdout
+    for value in page.values():
+        if isinstance(value, list):
+            return value
+    return []
 
-def fetch_mac_version(channel):
+class IncompletePages(Exception):
+    """A page of a versionhistory collection could not be fetched or parsed."""
+
+def iter_versionhistory_pages(url, page_size=PAGE_SIZE, known=None, session=None, item_key=None):
+    """
+    Yield each page of a versionhistory collection as a dict, following nextPageToken.
+    known: optional set of item names already stored; paging stops after the first page
+    that contains one of them, since everything older is already known.
+    item_key: optional function giving the key known holds for an item (default: its name).
+    Page tokens are opaque, so the pages of one collection are fetched one after another.
+    Raises IncompletePages when a page fails, so a partial walk is never taken for the whole collection.
+    """
+    if item_key is None:
+        item_key = lambda item: item.get("name")
+    token = None
+    while True:
+        text = fetch_text(page_url(url, page_size, token), session=session)
+        if not text:
+            raise IncompletePages(f"no response for a page of {url}")
+        try:
+            page = json.loads(text)
+        except ValueError as e:
+            raise IncompletePages(f"error parsing page of {url}: {e}") from e
+        if not isinstance(page, dict) or "error" in page:
+            raise IncompletePages(f"error response for a page of {url}: {text[:200]}")
+        token = page.get("nextPageToken") or ""
+        reached_known = bool(known) and any(item_key(item) in known for item in page_items(page))
+        yield page
+        if not token or reached_known:
+            return
+
+def merge_all_pages(url, session=None, **kwargs):
     """
-    Fetch the latest Mac Chrome version for a given channel.
-    Returns a dict with version, formatted release time, and timestamp.
+    Fetch every page of a versionhistory collection and merge them into one dict, shaped
+    like a single-page response with an empty nextPageToken (None if any page failed).
     """
-    print(f"Fetching latest Mac version for channel: {channel}")
-    url = f"https://versionhistory.googleapis.com/v1/chrome/platforms/mac/channels/{channel.lower()}/versions/all/releases?filter=endtime=none"
-    result = subprocess.run(["curl", "-s", url], capture_output=True, text=True)
-    if not result.stdout:
+    merged = None
+    try:
+        for page in iter_versionhistory_pages(url, session=session, **kwargs):
+            if merged is None:
+                merged = page
+                continue
+            for key, value in page.items():
+                if isinstance(value, list):
+                    merged.setdefault(key, []).extend(value)
+    except IncompletePages as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+    if merged is not None and "nextPageToken" in merged:
+        merged["nextPageToken"] = ""
+    return merged
+
+def parse_mac_version(channel, data):
+    """
+    Turn a merged versionhistory releases response (see merge_all_pages) into the latest Mac version dict.
+    """
+    if not data:
         return {"version": "N/A", "time": "N/A", "timestamp": "N/A"}
     try:
-        data = json.loads(result.stdout)
         releases = data.get("releases", [])
         if not releases:
             return {"version": "N/A", "time": "N/A", "timestamp": "N/A"}
@@ -54,41 +153,6 @@ def fetch_mac_version(channel):
         print(f"Error fetching mac version for channel {channel}: {e}")
         return {"version": "N/A", "time": "N/A", "timestamp": "N/A"}
 
-def convert_to_xml(json_data):
-    """
-    Convert Chrome version data from JSON to XML format.
-    """
-    root = ET.Element("versions")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")
-    for version in json_data["versions"]:
-        version_element = ET.SubElement(root, "version")
-        name_element = ET.SubElement(version_element, "name")
-        name_element.text = version["name"]
-        version_element = ET.SubElement(version_element, "version")
-        version_element.text = version["version"]
-    return minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
-
-def convert_to_yaml(json_data):
-    """
-    Convert Chrome version data from JSON to YAML format.
-    """
-    last_updated = {"last_updated": datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")}
-    json_data.update(last_updated)
-    if "nextPageToken" in json_data and not json_data["nextPageToken"]:
-        del json_data["nextPageToken"]
-    return yaml.dump(json_data, default_flow_style=False)
-
-def convert_to_json(json_data):
-    """
-    Convert Chrome version data to JSON string with last_updated.
-    """
-    last_updated = {"last_updated": datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")}
-    json_data = {**last_updated, **json_data}
-    if "nextPageToken" in json_data and not json_data["nextPageToken"]:
-        del json_data["nextPageToken"]
-    return json.dumps(json_data, indent=2)
-
 def convert_mac_versions_to_xml(stable, extended, beta, dev, canary, canary_asan):
     """
     Convert Mac Chrome channel versions to XML format.
@@ -145,7 +209,7 @@ def convert_mac_versions_to_xml(stable, extended, beta, dev, canary, canary_asan
     download_url = ET.SubElement(canary_asan_element, "download_link")
     download_url.text = "https://dl.google.com/chrome/mac/universal/canary/googlechromecanary.dmg"
 
-    return minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
+    return pretty_xml(root)
 
 def convert_mac_versions_to_yaml(stable, extended, beta, dev, canary, canary_asan):
     """
@@ -185,7 +249,7 @@ def convert_mac_versions_to_yaml(stable, extended, beta, dev, canary, canary_asa
         }
     }
     mac_versions = {**last_updated, **mac_versions}
-    return yaml.dump(mac_versions, default_flow_style=False)
+    return dump_yaml(mac_versions, default_flow_style=False)
 
 def convert_mac_versions_to_json(stable, extended, beta, dev, canary, canary_asan):
     """
@@ -225,19 +289,15 @@ def convert_mac_versions_to_json(stable, extended, beta, dev, canary, canary_asa
     }
     last_updated = {"last_updated": datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")}
     mac_versions = {**last_updated, **mac_versions}
-    return json.dumps(mac_versions, indent=2)
+    return dump_json(mac_versions)
 
-def fetch_chrome_history(channel):
+def parse_chrome_history(data):
     """
-    Fetch Chrome release history for a given channel.
-    Returns a list of dicts with version, release date, end date, fraction, and fraction group.
+    Turn a merged versionhistory releases response (see merge_all_pages) into a list of ChromeRelease.
     """
-    url = f"https://versionhistory.googleapis.com/v1/chrome/platforms/mac/channels/{channel}/versions/all/releases"
-    result = subprocess.run(["curl", "-s", url], capture_output=True, text=True)
-    if not result.stdout:
+    if not data:
         return []
     try:
-        data = json.loads(result.stdout)
         releases = data.get("releases", [])
         history = []
         for release in releases:
@@ -252,18 +312,53 @@ def fetch_chrome_history(channel):
             else:
                 fraction = f"{fraction_pct:.2f}".rstrip('0').rstrip('.') + "%"
             fraction_group = release.get("fractionGroup", "N/A")
-            history.append({
-                "version": version,
-                "release_date": start_time,
-                "end_date": end_time,
-                "fraction": fraction,
-                "fraction_group": fraction_group
-            })
+            history.append(ChromeRelease(version, start_time, end_time, fraction, fraction_group))
         return history
     except Exception as e:
         print(f"Error processing history: {e}")
         return []
 
+def release_key(release):
+    """
+    Identify a ChromeRelease across runs: (version, fraction_group, release_date).
+    """
+    return (release.version, release.fraction_group, release.release_date)
+
+def api_release_key(item):
+    """
+    release_key of a raw versionhistory release item, without parsing the rest of it.
+    """
+    return (item.get("version"), item.get("fractionGroup", "N/A"), format_time(item.get("serving", {}).get("startTime")))
+
+def load_history(path):
+    """
+    Read a chrome_<channel>_history.json file back into (last_updated, list of ChromeRelease).
+    Returns None if the file is missing or not in the expected shape.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data["last_updated"], [ChromeRelease(**release) for release in data["releases"]]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Could not load existing history {path}: {e}")
+        return None
+
+def merge_history(fetched, previous):
+    """
+    Merge the newest releases (fetched from the first pages, newest first) into the previous
+    history. Fetched releases replace the previous ones with the same key, which must form the
+    start of the previous history. Returns (merged, replaced): merged is fetched followed by
+    previous[replaced:]. Returns None when the keys overlap anywhere else, as the newest pages
+    then do not line up with the stored history.
+    """
+    fetched_keys = {release_key(release) for release in fetched}
+    replaced = 0
+    while replaced < len(previous) and release_key(previous[replaced]) in fetched_keys:
+        replaced += 1
+    if any(release_key(release) in fetched_keys for release in previous[replaced:]):
+        return None
+    return fetched + previous[replaced:], replaced
+
 def format_time(iso_time):
     """
     Convert ISO time string to formatted date string.
@@ -276,38 +371,91 @@ def format_time(iso_time):
     except ValueError:
         return "Invalid Time"
 
-def convert_history_to_json(history):
+def iter_history_json(history, last_updated):
     """
-    Convert Chrome release history to JSON string.
+    Yield Chrome release history (list of ChromeRelease) as JSON, release by release.
     """
-    return json.dumps({"releases": history}, indent=2)
+    return iter_json_document({"last_updated": last_updated}, "releases", (release.to_dict() for release in history))
 
-def convert_history_to_yaml(history):
+def iter_history_yaml(history, last_updated):
     """
-    Convert Chrome release history to YAML string.
+    Yield Chrome release history (list of ChromeRelease) as YAML, release by release.
     """
-    return yaml.dump({"releases": history}, default_flow_style=False)
+    return iter_yaml_document({"last_updated": last_updated}, "releases", (release.to_dict() for release in history), allow_unicode=True)
 
-def convert_history_to_xml(history):
+def release_to_xml(entry):
+    release_element = ET.Element("release")
+    version_element = ET.SubElement(release_element, "version")
+    version_element.text = entry.version
+    start_time_element = ET.SubElement(release_element, "release_date")
+    start_time_element.text = entry.release_date
+    end_time_element = ET.SubElement(release_element, "end_date")
+    end_time_element.text = entry.end_date
+    fraction_element = ET.SubElement(release_element, "fraction")
+    fraction_element.text = entry.fraction
+    fraction_group_element = ET.SubElement(release_element, "fraction_group")
+    fraction_group_element.text = str(entry.fraction_group)
+    return release_element
+
+def iter_history_xml(history, last_updated):
     """
-    Convert Chrome release history to XML format.
+    Yield Chrome release history (list of ChromeRelease) as XML, release by release.
     """
-    root = ET.Element("releases")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")
-    for entry in history:
-        release_element = ET.SubElement(root, "release")
-        version_element = ET.SubElement(release_element, "version")
-        version_element.text = entry["version"]
-        start_time_element = ET.SubElement(release_element, "release_date")
-        start_time_element.text = entry["release_date"]
-        end_time_element = ET.SubElement(release_element, "end_date")
-        end_time_element.text = entry["end_date"]
-        fraction_element = ET.SubElement(release_element, "fraction")
-        fraction_element.text = entry["fraction"]
-        fraction_group_element = ET.SubElement(release_element, "fraction_group")
-        fraction_group_element.text = str(entry["fraction_group"])
-    return minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
+    last_updated_element = ET.Element("last_updated")
+    last_updated_element.text = last_updated
+    elements = itertools.chain([last_updated_element], (release_to_xml(entry) for entry in history))
+    return iter_pretty_xml("releases", elements)
+
+# Extension -> (writer, text after the last release) for the chrome_<channel>_history.* files
+HISTORY_FORMATS = {
+    "json": (iter_history_json, "\n  ]\n}"),
+    "yaml": (iter_history_yaml, ""),
+    "xml": (iter_history_xml, "</releases>\n"),
+}
+
+def write_history(history, path, last_updated, patch=None):
+    """
+    Stream one channel's release history to every format; path is the output file name
+    without extension. Returns the file names written.
+    patch: optional (head, previous_last_updated, previous_head) when history[:head] replaces
+    previous_head at the start of the existing files and the rest of history is unchanged;
+    only the head is serialized and the remaining releases are copied from the old files.
+    In stable-output mode (see output_manifest) files whose releases did not change keep their stamp.
+    """
+    filenames = []
+    for ext, (iter_format, footer) in HISTORY_FORMATS.items():
+        filename = f"{path}.{ext}"
+        with span("write", path=filename):
+            patched = False
+            if patch:
+                head, previous_last_updated, previous_head = patch
+                previous_stamp = recorded_stamp(filename) or previous_last_updated
+                stamp = stable_stamp(filename, last_updated, history[:head] == previous_head)
+                patched = patch_stream(filename, iter_format(history[:head], stamp),
+                                       iter_format(previous_head, previous_stamp), footer)
+                if patched:
+                    record_output(filename, stamp, last_updated)
+            if not patched:
+                write_stable(filename, lambda stamp: iter_format(history, stamp), last_updated)
+        filenames.append(filename)
+    return filenames
+
+def load_previous_histories(output_dir, channels, last_updated):
+    """
+    Load the stored history of each channel that can be updated incrementally:
+    {channel: (last_updated, releases)}. Empty when a full rebuild is due (BOFA_CHROME_FULL_HISTORY,
+    or the files were last produced on another day).
+    """
+    previous = {}
+    if FULL_HISTORY:
+        return previous
+    today = last_updated.rsplit(" ", 3)[0]
+    for channel in channels:
+        path = os.path.join(output_dir, f"chrome_{channel}_history.json")
+        stored = load_history(path)
+        if stored and stored[1] and (checked_stamp(path) or stored[0]).rsplit(" ", 3)[0] == today:
+            previous[channel] = stored
+    return previous
 
 def main():
     """
@@ -318,133 +466,130 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     print(f"Output directory: {output_dir}")
 
-    channels = [
-        {"name": "extended", "channelType": "EXTENDED"},
-        {"name": "stable", "channelType": "STABLE"},
-        {"name": "beta", "channelType": "BETA"},
-        {"name": "dev", "channelType": "DEV"},
-        {"name": "canary", "channelType": "CANARY"},
-        {"name": "canary_asan", "channelType": "CANARY_ASAN"}
-    ]
-    
-    # Fetch and save version history for each channel in XML, YAML, and JSON
-    for channel in channels:
-        print(f"Processing channel: {channel['channelType']}")
-        try:
-            json_data = json.loads(fetch_chrome_versions(channel["name"]))
-        except Exception as e:
-            print(f"Error fetching versions for {channel['name']}: {e}")
-            continue
-        xml_data = convert_to_xml(json_data)
-        yaml_data = convert_to_yaml(json_data)
-        json_data_str = convert_to_json(json_data)
-        
-        xml_filename = os.path.join(output_dir, f"chrome_{channel['channelType'].lower()}_history.xml")
-        yaml_filename = os.path.join(output_dir, f"chrome_{channel['channelType'].lower()}_history.yaml")
-        json_filename = os.path.join(output_dir, f"chrome_{channel['channelType'].lower()}_history.json")
-        
-        with open(xml_filename, "w") as xml_file:
-            xml_file.write(xml_data)
-        print(f"Wrote XML: {xml_filename}")
-        with open(yaml_filename, "w") as yaml_file:
-            yaml_file.write(yaml_data)
-        print(f"Wrote YAML: {yaml_filename}")
-        with open(json_filename, "w") as json_file:
-            json_file.write(json_data_str)
-        print(f"Wrote JSON: {json_filename}")
-    
-    # Fetch and save Mac Stable, Beta, Dev, and Canary versions
     mac_channels = ["Stable", "Extended", "Beta", "Dev", "Canary", "Canary_ASAN"]
-    print("Fetching Mac channel versions...")
+    history_channels = ["stable", "extended", "beta", "dev", "canary", "canary_asan"]
+    # One timestamp for every file of this run
+    last_updated = datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")
+
+    # Send every channel/endpoint request at once; each response is converted as soon as it arrives
+    jobs = {}
+    for channel in mac_channels:
+        jobs[("mac", channel)] = mac_version_url(channel)
+    for channel in history_channels:
+        jobs[("history", channel)] = chrome_history_url(channel)
+
+    # Channels with a stored history only fetch pages up to the first release already stored
+    previous_histories = load_previous_histories(output_dir, history_channels, last_updated)
+    known_releases = {
+        chrome_history_url(channel): {release_key(release) for release in releases}
+        for channel, (_, releases) in previous_histories.items()
+    }
+
+    def fetch_pages(url, session=None):
+        if url in known_releases:
+            return merge_all_pages(url, session=session, known=known_releases[url], item_key=api_release_key)
+        return merge_all_pages(url, session=session)
+
+    def convert_response(key, data):
+        kind, channel = key
+        print(f"Received {kind} response for channel: {channel}")
+        if kind == "mac":
+            if data is None:
+                return None
+            payload_digests[channel] = digest(data)
+            with span("parse"):
+                return parse_mac_version(channel, data)
+        # Unchanged newest pages leave the channel's history files as they are
+        path = os.path.join(output_dir, f"chrome_{channel}_history")
+        filenames = [f"{path}.{ext}" for ext in HISTORY_FORMATS]
+        if data is None:
+            print(f"Could not fetch every page of the {channel} history; keeping the existing files")
+            return []
+        run_step(f"chrome_{channel}_history", {"releases": digest(data)}, filenames,
+                 lambda: update_history(channel, data, path, last_updated, previous_histories.get(channel)))
+        return filenames
+
+    payload_digests = {}
+    print(f"Fetching {len(jobs)} Chrome endpoints concurrently...")
+    results = fetch_many(jobs, on_result=convert_response, fetch=fetch_pages)
+
+    # A channel without a response would be written as "N/A"; fail instead, so run_pipeline keeps the last good files
+    missing = [channel for channel in mac_channels if results[("mac", channel)] is None]
+    if missing:
+        raise IncompletePages(f"no Mac version response for {', '.join(missing)}")
+
+    # Save Mac Stable, Beta, Dev, and Canary versions
     mac_versions = {}
     for channel in mac_channels:
-        mac_versions[channel.lower()] = fetch_mac_version(channel)
-    mac_versions_xml = convert_mac_versions_to_xml(
-        mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
-    )
-    mac_versions_yaml = convert_mac_versions_to_yaml(
-        mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
-    )
-    mac_versions_json = convert_mac_versions_to_json(
-        mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
-    )
-    
+        mac_versions[channel.lower()] = results[("mac", channel)]
+    outputs = [os.path.join(output_dir, f"chrome_latest_versions.{ext}") for ext in ("xml", "yaml", "json")]
+    run_step("chrome_latest_versions", payload_digests, outputs, lambda: write_mac_versions(mac_versions, output_dir))
+
+    # Release history was written for each channel as its response arrived
+    for channel in history_channels:
+        for filename in results[("history", channel)]:
+            print(f"Wrote {filename}")
+
+    print(COALESCER.report())
+
+def update_history(channel, data, path, last_updated, stored=None):
+    """
+    Parse a channel's fetched releases and write its history files; with stored (last_updated,
+    releases) from load_previous_histories, the fetched releases are merged into those.
+    Returns the file names written (none if a needed refetch failed).
+    """
+    with span("parse"):
+        history = parse_chrome_history(data)
+    if stored is None or not history:
+        return write_history(history, path, last_updated)
+    previous_last_updated, previous = stored
+    merged = merge_history(history, previous)
+    if merged is None:
+        print(f"Stored {channel} history does not line up with the newest releases; fetching every page")
+        data = merge_all_pages(chrome_history_url(channel))
+        if data is None:
+            print(f"Could not fetch every page of the {channel} history; keeping the existing files")
+            return []
+        with span("parse"):
+            history = parse_chrome_history(data)
+        return write_history(history, path, last_updated)
+    merged_history, replaced = merged
+    if not replaced:
+        # Paging never reached a stored release, so every page was fetched
+        return write_history(history, path, last_updated)
+    print(f"Merged {len(history)} newest {channel} releases over {replaced} stored; kept {len(merged_history) - len(history)} unchanged")
+    return write_history(merged_history, path, last_updated, patch=(len(history), previous_last_updated, previous[:replaced]))
+
+def write_mac_versions(mac_versions, output_dir):
+    """
+    Write chrome_latest_versions.xml, .yaml and .json from {channel: parse_mac_version result}.
+    """
     xml_filename = os.path.join(output_dir, "chrome_latest_versions.xml")
     yaml_filename = os.path.join(output_dir, "chrome_latest_versions.yaml")
     json_filename = os.path.join(output_dir, "chrome_latest_versions.json")
+
+    with span("serialize", path=xml_filename):
+        mac_versions_xml = convert_mac_versions_to_xml(
+            mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
+        )
+    with span("serialize", path=yaml_filename):
+        mac_versions_yaml = convert_mac_versions_to_yaml(
+            mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
+        )
+    with span("serialize", path=json_filename):
+        mac_versions_json = convert_mac_versions_to_json(
+            mac_versions["stable"], mac_versions["extended"], mac_versions["beta"], mac_versions["dev"], mac_versions["canary"], mac_versions["canary_asan"]
+        )
     
-    with open(xml_filename, "w") as xml_file:
-        xml_file.write(mac_versions_xml)
+    with span("write", path=xml_filename):
+        write_text(xml_filename, mac_versions_xml)
     print(f"Wrote Mac XML: {xml_filename}")
-    with open(yaml_filename, "w") as yaml_file:
-        yaml_file.write(mac_versions_yaml)
+    with span("write", path=yaml_filename):
+        write_text(yaml_filename, mac_versions_yaml)
     print(f"Wrote Mac YAML: {yaml_filename}")
-    with open(json_filename, "w") as json_file:
-        json_file.write(mac_versions_json)
+    with span("write", path=json_filename):
+        write_text(json_filename, mac_versions_json)
     print(f"Wrote Mac JSON: {json_filename}")
 
-    # Fetch and save Chrome release history for all channels
-    print("Fetching Chrome history for all channels...")
-    channels = ["stable", "extended", "beta", "dev", "canary", "canary_asan"]
-    for channel in channels:
-        print(f"Processing channel: {channel}")
-        history = fetch_chrome_history(channel)
-        history_json = convert_history_to_json(history)
-        history_yaml = convert_history_to_yaml(history)
-        history_xml = convert_history_to_xml(history)
-
-        json_filename = os.path.join(output_dir, f"chrome_{channel}_history.json")
-        yaml_filename = os.path.join(output_dir, f"chrome_{channel}_history.yaml")
-        xml_filename = os.path.join(output_dir, f"chrome_{channel}_history.xml")
-
-        with open(json_filename, "w") as json_file:
-            json_file.write(history_json)
-        print(f"Wrote JSON: {json_filename}")
-        with open(yaml_filename, "w") as yaml_file:
-            yaml_file.write(history_yaml)
-        print(f"Wrote YAML: {yaml_filename}")
-        with open(xml_filename, "w") as xml_file:
-            xml_file.write(history_xml)
-        print(f"Wrote XML: {xml_filename}")
-
-    # Convert all *_history.json files to YAML in the output directory
-    for filename in os.listdir(output_dir):
-        if filename.endswith("_history.json"):
-            json_path = os.path.join(output_dir, filename)
-            yaml_path = os.path.join(output_dir, filename.replace(".json", ".yaml"))
-            try:
-                with open(json_path, "r") as f:
-                    data = json.load(f)
-                with open(yaml_path, "w") as f:
-                    yaml.dump(data, f, sort_keys=False, allow_unicode=True)
-            except Exception as e:
-                print(f"Error converting {json_path} to YAML: {e}")
-
-    # Ensure all *_history.json and *_history.yaml files have last_updated at the top level
-    now_str = datetime.now(timezone('US/Eastern')).strftime("%B %d, %Y %I:%M %p %Z")
-    for filename in os.listdir(output_dir):
-        if filename.endswith("_history.json"):
-            json_path = os.path.join(output_dir, filename)
-            try:
-                with open(json_path, "r") as f:
-                    data = json.load(f)
-                if "last_updated" not in data:
-                    data = {"last_updated": now_str, **data}
-                    with open(json_path, "w") as f:
-                        json.dump(data, f, indent=2)
-            except Exception as e:
-                print(f"Error updating last_updated in {json_path}: {e}")
-        if filename.endswith("_history.yaml"):
-            yaml_path = os.path.join(output_dir, filename)
-            try:
-                with open(yaml_path, "r") as f:
-                    data = yaml.safe_load(f)
-                if data is not None and "last_updated" not in data:
-                    data = {"last_updated": now_str, **data}
-                    with open(yaml_path, "w") as f:
-                        yaml.dump(data, f, sort_keys=False, allow_unicode=True)
-            except Exception as e:
-                print(f"Error updating last_updated in {yaml_path}: {e}")
-
 if __name__ == "__main__":
     main()
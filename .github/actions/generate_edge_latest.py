@@ -1,20 +1,35 @@
 import os
-import requests
 import plistlib
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 from datetime import datetime
 import re
 import json
-import yaml
 from collections import defaultdict
 import pytz
+from build_graph import digest, run_step
+from http_client import get_shared_session
+from request_coalescer import COALESCER
+from run_report import span
+from serializers import dump_json, dump_yaml
+from stream_writers import write_text
+from xml_writer import pretty_xml
 
 # Define the Eastern Time Zone
 eastern = pytz.timezone('US/Eastern')
 
+# The products collection returns every channel in one response
+PRODUCTS_URL = "https://edgeupdates.microsoft.com/api/products"
+
+# Channel name used in our outputs -> "Product" name in the products collection
+PRODUCT_NAMES = {
+    "current": "Stable",
+    "canary": "Canary",
+    "dev": "Dev",
+    "beta": "Beta"
+}
+
 def fetch_edge_latest(channel, url):
-    response = requests.get(url)
+    response = get_shared_session().get(url)
     response.raise_for_status()
     
     xml_content = response.text
@@ -24,8 +39,7 @@ def fetch_edge_latest(channel, url):
     print(f"Directory '{output_dir}' created or already exists.")
     
     output_file = os.path.join(output_dir, f"edge_{channel}_version.xml")
-    with open(output_file, "w") as file:
-        file.write(xml_content)
+    write_text(output_file, xml_content)
     print(f"File '{output_file}' written successfully.")
     return output_file
 
@@ -86,38 +100,13 @@ def create_summary_xml(info_list, insider_info_list, output_file):
         ET.SubElement(entry, "Version").text = info["version"]
     
     tree = ET.ElementTree(root)
-    xml_str = ET.tostring(root, encoding='utf-8')
-    pretty_xml_str = minidom.parseString(xml_str).toprettyxml(indent="  ")
+    pretty_xml_str = pretty_xml(root)
     
-    with open(output_file, "w") as file:
-        file.write(pretty_xml_str)
+    write_text(output_file, pretty_xml_str)
     print(f"Summary file '{output_file}' written successfully.")
 
-def update_last_updated_in_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    
-    # Find or create last_updated element
-    last_updated = root.find("last_updated")
-    if last_updated is None:
-        last_updated = ET.Element("last_updated")
-        root.insert(0, last_updated)
-    
-    last_updated.text = datetime.now(eastern).strftime('%B %d, %Y %I:%M %p %Z')
-    
-    tree = ET.ElementTree(root)
-    xml_str = ET.tostring(root, encoding='utf-8')
-    pretty_xml_str = minidom.parseString(xml_str).toprettyxml(indent="  ")
-    
-    # Remove extra newlines and spaces
-    pretty_xml_str = "\n".join([line for line in pretty_xml_str.split("\n") if line.strip()])
-    
-    with open(file_path, "w") as file:
-        file.write(pretty_xml_str)
-    print(f"Updated file '{file_path}' with last_updated.")
-
 def fetch_edge_insider_canary_version(url):
-    response = requests.get(url)
+    response = get_shared_session().get(url)
     response.raise_for_status()
     
     releases = response.json()
@@ -153,37 +142,76 @@ def create_canary_xml(info, output_file):
     ET.SubElement(entry, "Version").text = info["version"]
     
     tree = ET.ElementTree(root)
-    xml_str = ET.tostring(root, encoding='utf-8')
-    pretty_xml_str = minidom.parseString(xml_str).toprettyxml(indent="  ")
+    pretty_xml_str = pretty_xml(root)
     
-    with open(output_file, "w") as file:
-        file.write(pretty_xml_str)
+    write_text(output_file, pretty_xml_str)
     print(f"Canary file '{output_file}' written successfully.")
 
+def release_info(release, channel):
+    artifact = next((artifact for artifact in release["Artifacts"] if artifact["ArtifactName"] == "pkg"), None)
+    location = artifact["Location"] if artifact else "N/A"
+    
+    return {
+        "channel": channel,
+        "date": datetime.strptime(release["PublishedTime"], '%Y-%m-%dT%H:%M:%S').astimezone(eastern).strftime('%B %d, %Y %I:%M %p %Z'),
+        "location": location,
+        "version": release["ProductVersion"]
+    }
+
 def fetch_edge_insider_version(url, channel):
-    response = requests.get(url)
+    response = get_shared_session().get(url)
     response.raise_for_status()
     
-    releases = response.json()
-    macos_releases = [release for release in releases[0]["Releases"] if release["Platform"] == "MacOS"]
+    with span("parse"):
+        releases = response.json()
+        macos_releases = [release for release in releases[0]["Releases"] if release["Platform"] == "MacOS"]
     
     if not macos_releases:
         print(f"No MacOS releases found for {channel}.")
         return None
     
     latest_release = max(macos_releases, key=lambda x: x["PublishedTime"])
+    return release_info(latest_release, channel)
+
+def build_macos_index(products):
+    """
+    Walk every product's Releases once and keep the newest MacOS release per product.
+    Returns {product name (lowercase): release}.
+    """
+    index = {}
+    for product in products:
+        name = product.get("Product", "").lower()
+        for release in product.get("Releases", []):
+            if release.get("Platform") != "MacOS":
+                continue
+            current = index.get(name)
+            if current is None or release["PublishedTime"] > current["PublishedTime"]:
+                index[name] = release
+    return index
+
+def fetch_edge_versions_bulk(channels):
+    """
+    Fetch all channels with one request to the products collection.
+    Returns {channel: info} for the channels that have a MacOS release.
+    """
+    response = get_shared_session().get(PRODUCTS_URL)
+    response.raise_for_status()
     
-    artifact = next((artifact for artifact in latest_release["Artifacts"] if artifact["ArtifactName"] == "pkg"), None)
-    location = artifact["Location"] if artifact else "N/A"
-    
-    return {
-        "channel": channel,
-        "date": datetime.strptime(latest_release["PublishedTime"], '%Y-%m-%dT%H:%M:%S').astimezone(eastern).strftime('%B %d, %Y %I:%M %p %Z'),
-        "location": location,
-        "version": latest_release["ProductVersion"]
-    }
+    with span("parse"):
+        index = build_macos_index(response.json())
+    results = {}
+    for channel in channels:
+        release = index.get(PRODUCT_NAMES[channel].lower())
+        if release is None:
+            print(f"No MacOS releases found for {channel} in products collection.")
+            continue
+        results[channel] = release_info(release, channel)
+    return results
 
-def create_insider_versions_xml(info_list, output_file):
+def create_insider_versions_tree(info_list):
+    """
+    Build the EdgeInsiderVersions tree every edge_latest_versions file is written from.
+    """
     root = ET.Element("EdgeInsiderVersions")
     
     # Add last_updated element
@@ -196,68 +224,43 @@ def create_insider_versions_xml(info_list, output_file):
         ET.SubElement(entry, "Date").text = info["date"]
         ET.SubElement(entry, "Location").text = info["location"]
         ET.SubElement(entry, "Version").text = info["version"]
+    return root
+
+def write_insider_versions_xml(root, output_file):
+    pretty_xml_str = pretty_xml(root)
     
-    tree = ET.ElementTree(root)
-    xml_str = ET.tostring(root, encoding='utf-8')
-    pretty_xml_str = minidom.parseString(xml_str).toprettyxml(indent="  ")
+    # Remove extra newlines and spaces
+    pretty_xml_str = "\n".join([line for line in pretty_xml_str.split("\n") if line.strip()])
     
-    with open(output_file, "w") as file:
-        file.write(pretty_xml_str)
+    write_text(output_file, pretty_xml_str)
     print(f"Insider versions file '{output_file}' written successfully.")
 
-def convert_xml_to_json(xml_file, json_file):
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-    
-    def etree_to_dict(t):
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(etree_to_dict, children):
-                for k, v in dc.items():
-                    dd[k].append(v)
-            d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
-        if t.attrib:
-            d[t.tag].update(('@' + k, v) for k, v in t.attrib.items())
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['#text'] = text
-            else:
-                d[t.tag] = text
-        return d
-    
+def etree_to_dict(t):
+    d = {t.tag: {} if t.attrib else None}
+    children = list(t)
+    if children:
+        dd = defaultdict(list)
+        for dc in map(etree_to_dict, children):
+            for k, v in dc.items():
+                dd[k].append(v)
+        d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
+    if t.attrib:
+        d[t.tag].update(('@' + k, v) for k, v in t.attrib.items())
+    if t.text:
+        text = t.text.strip()
+        if children or t.attrib:
+            if text:
+                d[t.tag]['#text'] = text
+        else:
+            d[t.tag] = text
+    return d
+
+def convert_tree_to_json(root, json_file):
     data_dict = etree_to_dict(root)
-    with open(json_file, "w") as file:
-        json.dump(data_dict, file, indent=4)
+    write_text(json_file, dump_json(data_dict, indent=4))
     print(f"JSON file '{json_file}' written successfully.")
 
-def convert_xml_to_yaml(xml_file, yaml_file):
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-    
-    def etree_to_dict(t):
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(etree_to_dict, children):
-                for k, v in dc.items():
-                    dd[k].append(v)
-            d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
-        if t.attrib:
-            d[t.tag].update(('@' + k, v) for k, v in t.attrib.items())
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['#text'] = text
-            else:
-                d[t.tag] = text
-        return d
-    
+def convert_tree_to_yaml(root, yaml_file):
     data_dict = etree_to_dict(root)
     
     # Create a new dictionary with the desired order
@@ -271,8 +274,7 @@ def convert_xml_to_yaml(xml_file, yaml_file):
         }
         data_dict = ordered_dict
     
-    with open(yaml_file, "w") as file:
-        yaml.dump(data_dict, file, default_flow_style=False, sort_keys=False)
+    write_text(yaml_file, dump_yaml(data_dict, default_flow_style=False, sort_keys=False))
     print(f"YAML file '{yaml_file}' written successfully.")
 
 def convert_plist_to_json(xml_file, json_file):
@@ -286,8 +288,7 @@ def convert_plist_to_json(xml_file, json_file):
             "plist_data": plist_data
         }
         
-        with open(json_file, 'w') as f:
-            json.dump(output_data, f, indent=2, default=str)
+        write_text(json_file, json.dumps(output_data, indent=2, default=str))
         print(f"JSON file '{json_file}' written successfully.")
     except Exception as e:
         print(f"Error converting plist to JSON: {e}")
@@ -303,13 +304,15 @@ def convert_plist_to_yaml(xml_file, yaml_file):
             "plist_data": plist_data
         }
         
-        with open(yaml_file, 'w') as f:
-            yaml.dump(output_data, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        write_text(yaml_file, dump_yaml(output_data, default_flow_style=False, sort_keys=False, allow_unicode=True))
         print(f"YAML file '{yaml_file}' written successfully.")
     except Exception as e:
         print(f"Error converting plist to YAML: {e}")
 
-if __name__ == "__main__":
+def main():
+    """
+    Fetch every Edge channel and write the edge_latest_versions XML, JSON and YAML files.
+    """
     # Remove the old channels dictionary and use insider_channels as channels
     channels = {
         "current": "https://edgeupdates.microsoft.com/api/products/stable",
@@ -318,16 +321,36 @@ if __name__ == "__main__":
         "beta": "https://edgeupdates.microsoft.com/api/products/beta"
     }
     
+    # One request for every channel; fall back to the per-channel endpoints for anything missing
+    try:
+        bulk_info = fetch_edge_versions_bulk(channels)
+    except Exception as e:
+        print(f"Bulk products fetch failed, using per-channel requests: {e}")
+        bulk_info = {}
+    
     info_list = []
     for channel, url in channels.items():
-        info = fetch_edge_insider_version(url, channel)
+        info = bulk_info.get(channel) or fetch_edge_insider_version(url, channel)
         if info:
             info_list.append(info)
     
     output_file = os.path.join("latest_edge_files", "edge_latest_versions.xml")
-    create_insider_versions_xml(info_list, output_file)
-    update_last_updated_in_xml(output_file)
-    
-    # Convert XML to JSON and YAML
-    convert_xml_to_json(output_file, os.path.join("latest_edge_files", "edge_latest_versions.json"))
-    convert_xml_to_yaml(output_file, os.path.join("latest_edge_files", "edge_latest_versions.yaml"))
+    json_file = os.path.join("latest_edge_files", "edge_latest_versions.json")
+    yaml_file = os.path.join("latest_edge_files", "edge_latest_versions.yaml")
+    # The channel details picked from the products payload are all the files are built from
+    run_step("edge_latest_versions", {"releases": digest(info_list)}, [output_file, json_file, yaml_file],
+             lambda: write_edge_latest_versions(info_list, output_file, json_file, yaml_file))
+    print(COALESCER.report())
+
+def write_edge_latest_versions(info_list, output_file, json_file, yaml_file):
+    # The XML, JSON and YAML files are all written from one tree, without reading any file back
+    root = create_insider_versions_tree(info_list)
+    with span("serialize", path=output_file):
+        write_insider_versions_xml(root, output_file)
+    with span("serialize", path=json_file):
+        convert_tree_to_json(root, json_file)
+    with span("serialize", path=yaml_file):
+        convert_tree_to_yaml(root, yaml_file)
+
+if __name__ == "__main__":
+    main()
@@ -1,149 +1,203 @@
-import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
+import bisect
+import itertools
 import re
-import subprocess
 import os
 import json
-import yaml
+import requests
 import pytz
+from build_graph import digest, run_step
+from http_client import get_shared_session, fetch_many
+from output_manifest import record_output, recorded_stamp, stable_stamp, write_stable
+from request_coalescer import COALESCER
+from run_report import span
+from serializers import dump_json, dump_yaml
+from stream_writers import iter_json_document, iter_yaml_document, patch_stream, write_text
 
-# Fetch Firefox release and devedition JSON data
-url_releases = "https://product-details.mozilla.org/1.0/firefox.json"
-response_releases = requests.get(url_releases)
-data_releases = response_releases.json()
+PRODUCT_DETAILS_URL = "https://product-details.mozilla.org/1.0/{}.json"
 
-url_devedition = "https://product-details.mozilla.org/1.0/devedition.json"
-response_devedition = requests.get(url_devedition)
-data_devedition = response_devedition.json()
+# download.mozilla.org entry points for each channel in firefox_latest_versions
+DOWNLOAD_URLS = {
+    "stable": "https://download.mozilla.org/?product=firefox-pkg-latest-ssl&os=osx",
+    "esr": "https://download.mozilla.org/?product=firefox-esr-pkg-latest-ssl&os=osx",
+    "beta": "https://download.mozilla.org/?product=firefox-beta-pkg-latest-ssl&os=osx",
+    "nightly": "https://download.mozilla.org/?product=firefox-nightly-pkg-latest-ssl&os=osx",
+    "dev": "https://download.mozilla.org/?product=firefox-devedition-latest-ssl&os=osx",
+}
+
+# firefox_versions.json key holding the version each download link currently points at
+DOWNLOAD_VERSION_KEYS = {
+    "stable": "LATEST_FIREFOX_VERSION",
+    "esr": "FIREFOX_ESR",
+    "beta": "LATEST_FIREFOX_DEVEL_VERSION",
+    "nightly": "FIREFOX_NIGHTLY",
+    "dev": "FIREFOX_DEVEDITION",
+}
+
+# Resolved redirect targets from previous runs, kept by the workflow cache
+REDIRECT_CACHE_PATH = os.path.join(".cache", "firefox_download_urls.json")
+
+# Date-ordered release keys of each history file as last written, kept by the workflow cache.
+# New releases are inserted into it and only the top of the history files is rewritten; the
+# first run of each day (or BOFA_FIREFOX_FULL_HISTORY=1) rebuilds the files from scratch.
+HISTORY_INDEX_PATH = os.path.join(".cache", "firefox_history_index.json")
+FULL_HISTORY = os.environ.get("BOFA_FIREFOX_FULL_HISTORY", "").lower() in ("1", "true", "yes")
 
-# Helper to get the final download URL for a Firefox product using curl
-def fetch_download_url(url):
-    try:
-        return subprocess.check_output(
-            ["curl", url, "-s", "-L", "-I", "-o", "/dev/null", "-w", "%{url_effective}"]
-        ).decode("utf-8").strip()
-    except subprocess.CalledProcessError:
-        return "N/A"
-
-# Get download URLs for all main Firefox channels
-firefox_download_url = fetch_download_url("https://download.mozilla.org/?product=firefox-pkg-latest-ssl&os=osx")
-firefox_esr_download_url = fetch_download_url("https://download.mozilla.org/?product=firefox-esr-pkg-latest-ssl&os=osx")
-firefox_beta_download_url = fetch_download_url("https://download.mozilla.org/?product=firefox-beta-pkg-latest-ssl&os=osx")
-firefox_nightly_download_url = fetch_download_url("https://download.mozilla.org/?product=firefox-nightly-pkg-latest-ssl&os=osx")
-firefox_devedition_download_url = fetch_download_url("https://download.mozilla.org/?product=firefox-devedition-latest-ssl&os=osx")
-
-# Build the main XML for latest Firefox versions
-root = ET.Element("mac_versions")
-
-# Add last_updated timestamp to the XML
 eastern = pytz.timezone('US/Eastern')
-last_updated = ET.SubElement(root, "last_updated")
-last_updated.text = datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z")
-
-# Find the newest stable release (major or stability)
-stable_release = None
-for release_key, release in data_releases["releases"].items():
-    if re.match(r'^firefox-\d+(\.\d+)*$', release_key):
-        if release.get("category") in ("major", "stability"):
-            if stable_release is None or release.get("date", "") > stable_release.get("date", ""):
-                stable_release = release
-
-# Add stable release info to XML
-stable = ET.SubElement(root, "stable")
-if stable_release:
-    ET.SubElement(stable, "version").text = stable_release.get("version", "N/A")
-    try:
-        dt = datetime.strptime(stable_release.get("date", ""), "%Y-%m-%d")
-        dt = eastern.localize(dt)
-        ET.SubElement(stable, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
-    except Exception:
-        ET.SubElement(stable, "release_time").text = stable_release.get("date", "N/A")
-else:
-    ET.SubElement(stable, "version").text = "N/A"
-    ET.SubElement(stable, "release_time").text = "N/A"
-ET.SubElement(stable, "download").text = firefox_download_url
-
-# Find the newest beta release (dev category)
-beta_release = None
-for release_key, release in data_releases["releases"].items():
-    if re.match(r'^firefox-\d+(\.\d+)*b\d+$', release_key):
-        if release.get("category") == "dev":
-            if beta_release is None or release.get("date", "") > beta_release.get("date", ""):
-                beta_release = release
-
-# Add beta release info to XML
-beta = ET.SubElement(root, "beta")
-if beta_release:
-    ET.SubElement(beta, "version").text = beta_release.get("version", "N/A")
+
+class ProductDetailsStore:
+    """
+    Per-run store for product-details.mozilla.org documents.
+    Each document (firefox, devedition, firefox_versions, ...) is downloaded at most once per run
+    and shared by every writer that needs it; digest() gives the sha256 of its raw body.
+    """
+
+    def __init__(self, session=None):
+        self._session = session
+        self._documents = {}
+        self._digests = {}
+
+    def get(self, name):
+        if name not in self._documents:
+            session = self._session or get_shared_session()
+            response = session.get(PRODUCT_DETAILS_URL.format(name))
+            response.raise_for_status()
+            self._digests[name] = digest(response.content)
+            with span("parse"):
+                self._documents[name] = response.json()
+        return self._documents[name]
+
+    def digest(self, name):
+        self.get(name)
+        return self._digests[name]
+
+# Helper to get the final download URL for a Firefox product by following its redirects with HEAD.
+# Returns (url, ok). Like curl -L before it, url is where the redirects end even if that answers
+# with an error status, and "N/A" only when the request fails; ok is False for either, so the
+# URL is published but not cached.
+def fetch_download_url(url, session=None):
+    session = session or get_shared_session()
     try:
-        dt = datetime.strptime(beta_release.get("date", ""), "%Y-%m-%d")
-        dt = eastern.localize(dt)
-        ET.SubElement(beta, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
-    except Exception:
-        ET.SubElement(beta, "release_time").text = beta_release.get("date", "N/A")
-else:
-    ET.SubElement(beta, "version").text = "N/A"
-    ET.SubElement(beta, "release_time").text = "N/A"
-ET.SubElement(beta, "download").text = firefox_beta_download_url
-
-# Find the newest Developer Edition release
-dev_release = None
-for release in data_devedition["releases"].values():
-    if dev_release is None or release.get("date", "") > dev_release.get("date", ""):
-        dev_release = release
-
-# Add Developer Edition info to XML
-dev = ET.SubElement(root, "dev")
-if dev_release:
-    ET.SubElement(dev, "version").text = dev_release.get("version", "N/A")
+        response = session.head(url, allow_redirects=True)
+    except requests.RequestException:
+        return "N/A", False
+    return response.url, response.ok
+
+def load_redirect_cache():
     try:
-        dt = datetime.strptime(dev_release.get("date", ""), "%Y-%m-%d")
-        dt = eastern.localize(dt)
-        ET.SubElement(dev, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
-    except Exception:
-        ET.SubElement(dev, "release_time").text = dev_release.get("date", "N/A")
-else:
-    ET.SubElement(dev, "version").text = "N/A"
-    ET.SubElement(dev, "release_time").text = "N/A"
-ET.SubElement(dev, "download").text = firefox_devedition_download_url
-
-# Find the newest ESR release
-esr_release = None
-for release_key, release in data_releases["releases"].items():
-    if release_key.endswith("esr") and release.get("category") == "esr":
-        if esr_release is None or release.get("date", "") > esr_release.get("date", ""):
-            esr_release = release
-
-# Add ESR info to XML
-esr = ET.SubElement(root, "esr")
-if esr_release:
-    ET.SubElement(esr, "version").text = esr_release.get("version", "N/A")
+        with open(REDIRECT_CACHE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_redirect_cache(cache):
+    os.makedirs(os.path.dirname(REDIRECT_CACHE_PATH), exist_ok=True)
+    with open(REDIRECT_CACHE_PATH, "w") as f:
+        json.dump(cache, f, indent=2)
+
+def resolve_download_urls(store):
+    """
+    Return {channel: final download URL} for every entry in DOWNLOAD_URLS.
+    A channel whose version in firefox_versions.json matches the cached one reuses the cached
+    target; the rest are resolved concurrently over the shared connection pool, and cached
+    when their final response succeeded.
+    """
+    versions = store.get("firefox_versions")
+    cache = load_redirect_cache()
+    resolved = {}
+    pending = {}
+    for channel, url in DOWNLOAD_URLS.items():
+        version = versions.get(DOWNLOAD_VERSION_KEYS[channel])
+        cached = cache.get(channel, {})
+        if version and cached.get("source") == url and cached.get("version") == version:
+            resolved[channel] = cached["url"]
+        else:
+            pending[channel] = url
+    if pending:
+        for channel, (target, ok) in fetch_many(pending, fetch=fetch_download_url).items():
+            resolved[channel] = target
+            version = versions.get(DOWNLOAD_VERSION_KEYS[channel])
+            if version and ok:
+                cache[channel] = {"source": pending[channel], "version": version, "url": target}
+        save_redirect_cache(cache)
+    print(f"Download links: {len(pending)} resolved, {len(DOWNLOAD_URLS) - len(pending)} reused from cache.")
+    return resolved
+
+def newest_release(releases, matches):
+    """Return the release with the latest date among those accepted by matches(key, release)."""
+    newest = None
+    for release_key, release in releases.items():
+        if matches(release_key, release):
+            if newest is None or release.get("date", "") > newest.get("date", ""):
+                newest = release
+    return newest
+
+def add_release_channel(root, tag, release, download_url):
+    """Add a <tag> element with version, release_time and download for a product-details release."""
+    channel = ET.SubElement(root, tag)
+    if release:
+        ET.SubElement(channel, "version").text = release.get("version", "N/A")
+        try:
+            dt = datetime.strptime(release.get("date", ""), "%Y-%m-%d")
+            dt = eastern.localize(dt)
+            ET.SubElement(channel, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
+        except Exception:
+            ET.SubElement(channel, "release_time").text = release.get("date", "N/A")
+    else:
+        ET.SubElement(channel, "version").text = "N/A"
+        ET.SubElement(channel, "release_time").text = "N/A"
+    ET.SubElement(channel, "download").text = download_url
+    return channel
+
+def build_latest_versions_xml(store, download_urls):
+    """Build the <mac_versions> tree for firefox_latest_versions from product-details data."""
+    data_releases = store.get("firefox")
+    data_devedition = store.get("devedition")
+    data_versions = store.get("firefox_versions")
+
+    root = ET.Element("mac_versions")
+
+    # Add last_updated timestamp to the XML
+    last_updated = ET.SubElement(root, "last_updated")
+    last_updated.text = datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z")
+
+    # Newest stable release (major or stability)
+    stable_release = newest_release(
+        data_releases["releases"],
+        lambda key, release: re.match(r'^firefox-\d+(\.\d+)*$', key) and release.get("category") in ("major", "stability")
+    )
+    add_release_channel(root, "stable", stable_release, download_urls["stable"])
+
+    # Newest beta release (dev category)
+    beta_release = newest_release(
+        data_releases["releases"],
+        lambda key, release: re.match(r'^firefox-\d+(\.\d+)*b\d+$', key) and release.get("category") == "dev"
+    )
+    add_release_channel(root, "beta", beta_release, download_urls["beta"])
+
+    # Newest Developer Edition release
+    dev_release = newest_release(data_devedition["releases"], lambda key, release: True)
+    add_release_channel(root, "dev", dev_release, download_urls["dev"])
+
+    # Newest ESR release
+    esr_release = newest_release(
+        data_releases["releases"],
+        lambda key, release: key.endswith("esr") and release.get("category") == "esr"
+    )
+    add_release_channel(root, "esr", esr_release, download_urls["esr"])
+
+    # Nightly comes from firefox_versions.json
+    nightly = ET.SubElement(root, "nightly")
+    ET.SubElement(nightly, "version").text = data_versions.get("FIREFOX_NIGHTLY", "N/A")
     try:
-        dt = datetime.strptime(esr_release.get("date", ""), "%Y-%m-%d")
+        dt = datetime.strptime(data_versions.get("LAST_MERGE_DATE", ""), "%Y-%m-%d")
         dt = eastern.localize(dt)
-        ET.SubElement(esr, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
+        ET.SubElement(nightly, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
     except Exception:
-        ET.SubElement(esr, "release_time").text = esr_release.get("date", "N/A")
-else:
-    ET.SubElement(esr, "version").text = "N/A"
-    ET.SubElement(esr, "release_time").text = "N/A"
-ET.SubElement(esr, "download").text = firefox_esr_download_url
-
-# Add Nightly info to XML
-url_versions = "https://product-details.mozilla.org/1.0/firefox_versions.json"
-response_versions = requests.get(url_versions)
-data_versions = response_versions.json()
-
-nightly = ET.SubElement(root, "nightly")
-ET.SubElement(nightly, "version").text = data_versions.get("FIREFOX_NIGHTLY", "N/A")
-try:
-    dt = datetime.strptime(data_versions.get("LAST_MERGE_DATE", ""), "%Y-%m-%d")
-    dt = eastern.localize(dt)
-    ET.SubElement(nightly, "release_time").text = dt.strftime("%B %d, %Y %I:%M %p %Z")
-except Exception:
-    ET.SubElement(nightly, "release_time").text = data_versions.get("LAST_MERGE_DATE", "N/A")
-ET.SubElement(nightly, "download").text = firefox_nightly_download_url
+        ET.SubElement(nightly, "release_time").text = data_versions.get("LAST_MERGE_DATE", "N/A")
+    ET.SubElement(nightly, "download").text = download_urls["nightly"]
+    return root
 
 # Pretty-print XML for readability
 def pretty_print_xml(element, level=0):
@@ -156,16 +210,6 @@ def pretty_print_xml(element, level=0):
     if level and (not element.tail or not element.tail.strip()):
         element.tail = "\n" + indent * level
 
-# Save the main XML, JSON, and YAML for latest versions
-pretty_print_xml(root)
-xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
-
-output_dir = os.path.join(os.getcwd(), 'latest_firefox_files')
-os.makedirs(output_dir, exist_ok=True)
-with open(os.path.join(output_dir, "firefox_latest_versions.xml"), "w") as f:
-    f.write(xml_data)
-print("firefox_latest_versions.xml created successfully in latest_firefox_files.")
-
 # Convert XML to dict for JSON/YAML export
 def xml_to_dict(element):
     if len(element) == 0:
@@ -181,19 +225,38 @@ def xml_to_dict(element):
             result[child.tag] = child_dict
     return result
 
-data_dict = xml_to_dict(root)
-json_data = json.dumps(data_dict, indent=2)
-yaml_data = yaml.dump(data_dict, sort_keys=False)
+# Write the main XML, JSON, and YAML for latest versions
+def write_firefox_latest_versions_files(store, output_dir):
+    download_urls = resolve_download_urls(store)
+    inputs = {name: store.digest(name) for name in ("firefox", "devedition", "firefox_versions")}
+    inputs["download_urls"] = digest(download_urls)
+    outputs = [os.path.join(output_dir, f"firefox_latest_versions.{ext}") for ext in ("xml", "json", "yaml")]
+    run_step("firefox_latest_versions", inputs, outputs, lambda: write_latest_versions(store, download_urls, output_dir))
+
+def write_latest_versions(store, download_urls, output_dir):
+    root = build_latest_versions_xml(store, download_urls)
+    with span("serialize", path=os.path.join(output_dir, "firefox_latest_versions.xml")):
+        pretty_print_xml(root)
+        xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
 
-with open(os.path.join(output_dir, "firefox_latest_versions.json"), "w") as f:
-    f.write(json_data)
-with open(os.path.join(output_dir, "firefox_latest_versions.yaml"), "w") as f:
-    f.write(yaml_data)
-print("firefox_latest_versions.json and firefox_latest_versions.yaml created successfully in latest_firefox_files.")
+    with span("write", path=os.path.join(output_dir, "firefox_latest_versions.xml")):
+        write_text(os.path.join(output_dir, "firefox_latest_versions.xml"), xml_data)
+    print("firefox_latest_versions.xml created successfully in latest_firefox_files.")
+
+    data_dict = xml_to_dict(root)
+    with span("serialize", path=os.path.join(output_dir, "firefox_latest_versions.json")):
+        json_data = dump_json(data_dict)
+    with span("serialize", path=os.path.join(output_dir, "firefox_latest_versions.yaml")):
+        yaml_data = dump_yaml(data_dict, sort_keys=False)
+
+    with span("write", path=os.path.join(output_dir, "firefox_latest_versions.json")):
+        write_text(os.path.join(output_dir, "firefox_latest_versions.json"), json_data)
+    with span("write", path=os.path.join(output_dir, "firefox_latest_versions.yaml")):
+        write_text(os.path.join(output_dir, "firefox_latest_versions.yaml"), yaml_data)
+    print("firefox_latest_versions.json and firefox_latest_versions.yaml created successfully in latest_firefox_files.")
 
 # Helper to get the current last_updated string
 def get_last_updated_str():
-    eastern = pytz.timezone('US/Eastern')
     return datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z")
 
 def make_pkg_links(version, date=None):
@@ -221,90 +284,222 @@ def make_pkg_links(version, date=None):
     dmg_url = base_url + dmg_name
     return [pkg_url, dmg_url]
 
-# Write all Firefox release history files (all channels, newest first)
-def write_firefox_all_history_files():
-    url = "https://product-details.mozilla.org/1.0/firefox.json"
-    data = requests.get(url).json()
-    releases = []
-    for key, info in data.get("releases", {}).items():
-        entry = dict(key=key)
-        entry.update(info)
-        # Add links for each release (use 'version' field)
-        version = entry.get("version")
-        date = entry.get("date")
-        if version:
-            links = make_pkg_links(version, date)
-            entry["download_pkg"] = links[0]
-            entry["download_dmg"] = links[1]
-        releases.append(entry)
-    releases.sort(key=lambda x: x.get("date", ""), reverse=True)
-    root = ET.Element("firefox_all_history")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = get_last_updated_str()
-    for rel in releases:
-        rel_elem = ET.SubElement(root, "release")
-        for k, v in rel.items():
-            if k not in ("download_pkg", "download_dmg"):
-                ET.SubElement(rel_elem, k).text = str(v)
-        # Only add one pkg and one dmg link per release
-        if rel.get("download_pkg"):
-            ET.SubElement(rel_elem, "download_pkg").text = rel["download_pkg"]
-        if rel.get("download_dmg"):
-            ET.SubElement(rel_elem, "download_dmg").text = rel["download_dmg"]
-    pretty_print_xml(root)
-    xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
-    json_obj = {"last_updated": get_last_updated_str(), "releases": releases}
-    json_data = json.dumps(json_obj, indent=2)
-    yaml_data = yaml.dump(json_obj, sort_keys=False)
-    with open(os.path.join(output_dir, "firefox_all_history.xml"), "w") as f:
-        f.write(xml_data)
-    with open(os.path.join(output_dir, "firefox_all_history.json"), "w") as f:
-        f.write(json_data)
-    with open(os.path.join(output_dir, "firefox_all_history.yaml"), "w") as f:
-        f.write(yaml_data)
-    print("firefox_all_history.xml, .json, .yaml created successfully in latest_firefox_files.")
+def release_to_xml(rel):
+    rel_elem = ET.Element("release")
+    for k, v in rel.items():
+        if k not in ("download_pkg", "download_dmg"):
+            ET.SubElement(rel_elem, k).text = str(v)
+    # Only add one pkg and one dmg link per release
+    if rel.get("download_pkg"):
+        ET.SubElement(rel_elem, "download_pkg").text = rel["download_pkg"]
+    if rel.get("download_dmg"):
+        ET.SubElement(rel_elem, "download_dmg").text = rel["download_dmg"]
+    return rel_elem
 
-# Write Firefox beta/dev history files (newest first)
-def write_firefox_beta_dev_history_files():
-    url = "https://product-details.mozilla.org/1.0/firefox_history_development_releases.json"
-    data = requests.get(url).json()
-    releases = []
-    for key, info in data.items():
-        # info is a date string
-        entry = dict(version=key, date=info)
-        links = make_pkg_links(key, info)
+def iter_indented_xml(tag, elements):
+    """
+    Yield what pretty_print_xml + ET.tostring(encoding='utf8') give for a <tag> root holding
+    elements, one element at a time, so the whole tree never has to exist at once.
+    """
+    declaration = "<?xml version='1.0' encoding='utf8'?>\n"
+    first = True
+    for element in elements:
+        if first:
+            yield f"{declaration}<{tag}>"
+            first = False
+        pretty_print_xml(element, level=1)
+        element.tail = None
+        yield "\n  " + ET.tostring(element, encoding="unicode")
+    yield f"{declaration}<{tag} />" if first else f"\n</{tag}>"
+
+def iter_history_xml(name, releases, last_updated):
+    last_updated_elem = ET.Element("last_updated")
+    last_updated_elem.text = last_updated
+    elements = itertools.chain([last_updated_elem], (release_to_xml(rel) for rel in releases))
+    return iter_indented_xml(name, elements)
+
+def iter_history_json(name, releases, last_updated):
+    return iter_json_document({"last_updated": last_updated}, "releases", releases)
+
+def iter_history_yaml(name, releases, last_updated):
+    return iter_yaml_document({"last_updated": last_updated}, "releases", releases)
+
+# Extension -> (writer, text after the last release) for the history files
+HISTORY_FORMATS = {
+    "xml": (iter_history_xml, "\n</{name}>"),
+    "json": (iter_history_json, "\n  ]\n}}"),
+    "yaml": (iter_history_yaml, ""),
+}
+
+def history_outputs(output_dir, name):
+    return [os.path.join(output_dir, f"{name}.{ext}") for ext in HISTORY_FORMATS]
+
+def write_history_files(output_dir, name, releases, last_updated):
+    """
+    Stream a history (list of release dicts, newest first) to <name>.xml, .json and .yaml,
+    release by release. Returns {extension: file size}.
+    """
+    sizes = {}
+    for ext, (iter_format, _) in HISTORY_FORMATS.items():
+        path = os.path.join(output_dir, f"{name}.{ext}")
+        with span("write", path=path):
+            write_stable(path, lambda stamp: iter_format(name, releases, stamp), last_updated)
+        sizes[ext] = os.path.getsize(path)
+    print(f"{name}.xml, .json, .yaml created successfully in latest_firefox_files.")
+    return sizes
+
+def patch_history_files(output_dir, name, head, last_updated, previous_head, previous_last_updated, sizes):
+    """
+    Replace previous_head (the newest releases in the files, which must still have the given
+    sizes) with head, copying the older releases as they are. Returns {extension: file size},
+    or None if a file did not match and the history has to be written in full.
+    """
+    new_sizes = {}
+    for ext, (iter_format, footer) in HISTORY_FORMATS.items():
+        path = os.path.join(output_dir, f"{name}.{ext}")
+        with span("write", path=path):
+            if not os.path.exists(path) or os.path.getsize(path) != sizes.get(ext):
+                return None
+            previous_stamp = recorded_stamp(path) or previous_last_updated
+            stamp = stable_stamp(path, last_updated, head == previous_head)
+            if not patch_stream(path, iter_format(name, head, stamp),
+                                iter_format(name, previous_head, previous_stamp), footer.format(name=name)):
+                return None
+            record_output(path, stamp, last_updated)
+        new_sizes[ext] = os.path.getsize(path)
+    print(f"{name}.xml, .json, .yaml updated in latest_firefox_files ({len(head)} newest releases rewritten).")
+    return new_sizes
+
+def load_history_index():
+    """
+    Load {history name: {"keys", "dates", "digests", "last_updated", "sizes"}}; keys, dates
+    and the digests of their release dicts run oldest first, the reverse of the history files,
+    and last_updated is the time of the run that produced them (in stable-output mode the files
+    may embed an older one).
+    """
+    try:
+        with open(HISTORY_INDEX_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_history_index(name, entry):
+    index = load_history_index()
+    index[name] = entry
+    os.makedirs(os.path.dirname(HISTORY_INDEX_PATH), exist_ok=True)
+    with open(HISTORY_INDEX_PATH, "w") as f:
+        json.dump(index, f)
+
+def sorted_history_keys(items, date_of):
+    """
+    Keys of items (payload key -> info) oldest first: the history file order reversed.
+    The files list releases newest first, releases of the same date in payload order.
+    """
+    keys = list(items)[::-1]
+    keys.sort(key=lambda key: date_of(items[key]))
+    return keys
+
+def insert_history_keys(keys, dates, new_keys, items, date_of):
+    """
+    Insert new_keys into the oldest-first keys/dates lists where a full sort would put them.
+    Returns the lowest position that changed; everything below it is untouched.
+    """
+    lowest = len(keys)
+    positions = None
+    for key in new_keys:
+        date = date_of(items[key])
+        lo = bisect.bisect_left(dates, date)
+        hi = bisect.bisect_right(dates, date, lo)
+        if lo == hi:
+            keys.insert(lo, key)
+            dates.insert(lo, date)
+        else:
+            # Releases of the same date are ordered by their position in the payload
+            if positions is None:
+                positions = {k: i for i, k in enumerate(items)}
+            keys[lo:hi] = sorted(keys[lo:hi] + [key], key=positions.__getitem__, reverse=True)
+            dates[lo:hi] = [date] * (hi - lo + 1)
+        lowest = min(lowest, lo)
+    return lowest
+
+def update_history_files(output_dir, name, items, make_entry, date_of):
+    """
+    Write the <name> history files for items (payload key -> info), newest first.
+    make_entry(key, info) builds a release dict and date_of(info) its sort date.
+    When the index from the last run still matches the files, only new releases are
+    inserted and the files are patched from the deepest insertion point up; otherwise
+    (a release was removed or changed, the index is missing or a daily rebuild is due)
+    every release is written.
+    """
+    last_updated = get_last_updated_str()
+    stored = load_history_index().get(name)
+    entry_digests = {key: digest(make_entry(key, info)) for key, info in items.items()}
+    if stored and not FULL_HISTORY and stored["last_updated"].rsplit(" ", 3)[0] == last_updated.rsplit(" ", 3)[0]:
+        keys, dates = stored["keys"], stored["dates"]
+        known = set(keys)
+        new_keys = [key for key in items if key not in known]
+        # Every release already in the files must still build the same entry
+        unchanged = len(stored.get("digests", ())) == len(keys) and all(
+            entry_digests.get(key) == stored_digest for key, stored_digest in zip(keys, stored["digests"]))
+        if keys and unchanged and len(keys) + len(new_keys) == len(items):
+            previous_keys = list(keys)
+            # Rewrite at least the newest release, so the patched head is never empty
+            lowest = min(insert_history_keys(keys, dates, new_keys, items, date_of), len(previous_keys) - 1)
+            head = [make_entry(key, items[key]) for key in reversed(keys[lowest:])]
+            previous_head = [make_entry(key, items[key]) for key in reversed(previous_keys[lowest:])]
+            sizes = patch_history_files(output_dir, name, head, last_updated, previous_head, stored["last_updated"], stored["sizes"])
+            if sizes is not None:
+                save_history_index(name, {"keys": keys, "dates": dates, "digests": [entry_digests[key] for key in keys],
+                                          "last_updated": last_updated, "sizes": sizes})
+                return
+    keys = sorted_history_keys(items, date_of)
+    releases = [make_entry(key, items[key]) for key in reversed(keys)]
+    sizes = write_history_files(output_dir, name, releases, last_updated)
+    save_history_index(name, {"keys": keys, "dates": [date_of(items[key]) for key in keys],
+                              "digests": [entry_digests[key] for key in keys], "last_updated": last_updated, "sizes": sizes})
+
+def all_history_entry(key, info):
+    entry = dict(key=key)
+    entry.update(info)
+    # Add links for each release (use 'version' field)
+    version = entry.get("version")
+    date = entry.get("date")
+    if version:
+        links = make_pkg_links(version, date)
         entry["download_pkg"] = links[0]
         entry["download_dmg"] = links[1]
-        releases.append(entry)
-    releases.sort(key=lambda x: x.get("date", ""), reverse=True)
-    root = ET.Element("firefox_beta_dev_history")
-    last_updated = ET.SubElement(root, "last_updated")
-    last_updated.text = get_last_updated_str()
-    for rel in releases:
-        rel_elem = ET.SubElement(root, "release")
-        for k, v in rel.items():
-            if k not in ("download_pkg", "download_dmg"):
-                ET.SubElement(rel_elem, k).text = str(v)
-        # Only add one pkg and one dmg link per release
-        ET.SubElement(rel_elem, "download_pkg").text = rel["download_pkg"]
-        ET.SubElement(rel_elem, "download_dmg").text = rel["download_dmg"]
-    pretty_print_xml(root)
-    xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
-    json_obj = {"last_updated": get_last_updated_str(), "releases": releases}
-    json_data = json.dumps(json_obj, indent=2)
-    yaml_data = yaml.dump(json_obj, sort_keys=False)
-    with open(os.path.join(output_dir, "firefox_beta_dev_history.xml"), "w") as f:
-        f.write(xml_data)
-    with open(os.path.join(output_dir, "firefox_beta_dev_history.json"), "w") as f:
-        f.write(json_data)
-    with open(os.path.join(output_dir, "firefox_beta_dev_history.yaml"), "w") as f:
-        f.write(yaml_data)
-    print("firefox_beta_dev_history.xml, .json, .yaml created successfully in latest_firefox_files.")
+    return entry
+
+def beta_dev_history_entry(version, date):
+    # The development history maps each version to its date string
+    entry = dict(version=version, date=date)
+    links = make_pkg_links(version, date)
+    entry["download_pkg"] = links[0]
+    entry["download_dmg"] = links[1]
+    return entry
+
+# Write all Firefox release history files (all channels, newest first)
+def write_firefox_all_history_files(store, output_dir):
+    data = store.get("firefox")
+    run_step("firefox_all_history", {"firefox": store.digest("firefox")}, history_outputs(output_dir, "firefox_all_history"),
+             lambda: update_history_files(output_dir, "firefox_all_history", data.get("releases", {}), all_history_entry,
+                                          lambda info: info.get("date", "")))
+
+# Write Firefox beta/dev history files (newest first)
+def write_firefox_beta_dev_history_files(store, output_dir):
+    data = store.get("firefox_history_development_releases")
+    run_step("firefox_beta_dev_history", {"firefox_history_development_releases": store.digest("firefox_history_development_releases")},
+             history_outputs(output_dir, "firefox_beta_dev_history"),
+             lambda: update_history_files(output_dir, "firefox_beta_dev_history", data, beta_dev_history_entry, lambda date: date))
 
 # Write all Firefox version info files (structure as-is, with last_updated at the top)
-def write_firefox_all_version_info_files():
-    url = "https://product-details.mozilla.org/1.0/firefox_versions.json"
-    data = requests.get(url).json()
+def write_firefox_all_version_info_files(store, output_dir):
+    outputs = [os.path.join(output_dir, f"firefox_all_version_info.{ext}") for ext in ("xml", "json", "yaml")]
+    run_step("firefox_all_version_info", {"firefox_versions": store.digest("firefox_versions")}, outputs,
+             lambda: write_all_version_info(store, output_dir))
+
+def write_all_version_info(store, output_dir):
+    data = store.get("firefox_versions")
     # XML
     def dict_to_xml(parent, d):
         for k, v in d.items():
@@ -317,23 +512,39 @@ def write_firefox_all_version_info_files():
     last_updated = ET.SubElement(root, "last_updated")
     last_updated.text = get_last_updated_str()
     dict_to_xml(root, data)
-    pretty_print_xml(root)
-    xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
+    with span("serialize", path=os.path.join(output_dir, "firefox_all_version_info.xml")):
+        pretty_print_xml(root)
+        xml_data = ET.tostring(root, encoding='utf8', method='xml').decode()
     # JSON/YAML with last_updated at the top
     json_obj = {"last_updated": get_last_updated_str()}
     json_obj.update(data)
-    json_data = json.dumps(json_obj, indent=2)
-    yaml_data = yaml.dump(json_obj, sort_keys=False)
+    with span("serialize", path=os.path.join(output_dir, "firefox_all_version_info.json")):
+        json_data = dump_json(json_obj)
+    with span("serialize", path=os.path.join(output_dir, "firefox_all_version_info.yaml")):
+        yaml_data = dump_yaml(json_obj, sort_keys=False)
     # Write files
-    with open(os.path.join(output_dir, "firefox_all_version_info.xml"), "w") as f:
-        f.write(xml_data)
-    with open(os.path.join(output_dir, "firefox_all_version_info.json"), "w") as f:
-        f.write(json_data)
-    with open(os.path.join(output_dir, "firefox_all_version_info.yaml"), "w") as f:
-        f.write(yaml_data)
+    with span("write", path=os.path.join(output_dir, "firefox_all_version_info.xml")):
+        write_text(os.path.join(output_dir, "firefox_all_version_info.xml"), xml_data)
+    with span("write", path=os.path.join(output_dir, "firefox_all_version_info.json")):
+        write_text(os.path.join(output_dir, "firefox_all_version_info.json"), json_data)
+    with span("write", path=os.path.join(output_dir, "firefox_all_version_info.yaml")):
+        write_text(os.path.join(output_dir, "firefox_all_version_info.yaml"), yaml_data)
     print("firefox_all_version_info.xml, .json, .yaml created successfully in latest_firefox_files.")
 
-# Run all history/version info writers
-write_firefox_all_history_files()
-write_firefox_beta_dev_history_files()
-write_firefox_all_version_info_files()
+def main(output_dir=None):
+    """
+    Fetch product-details once and write every Firefox output file.
+    """
+    output_dir = output_dir or os.path.join(os.getcwd(), 'latest_firefox_files')
+    os.makedirs(output_dir, exist_ok=True)
+    store = ProductDetailsStore()
+    write_firefox_latest_versions_files(store, output_dir)
+    # Run all history/version info writers
+    write_firefox_all_history_files(store, output_dir)
+    write_firefox_beta_dev_history_files(store, output_dir)
+    write_firefox_all_version_info_files(store, output_dir)
+    print(COALESCER.report())
+
+if __name__ == "__main__":
+    main()
+
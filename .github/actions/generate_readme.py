@@ -2,6 +2,9 @@ import xml.etree.ElementTree as ET
 import os
 from datetime import datetime
 from pytz import timezone
+from output_manifest import run_stamp
+from run_report import span
+from stream_writers import write_text
 
 def parse_xml_file(file_path):
     """Parse XML file robustly, handling encoding and BOM issues."""
@@ -392,6 +395,14 @@ def get_last_updated_from_xml(xml_path, browser, channel=None):
                 continue
         return date_str  # fallback: return as-is
 
+    def last_updated_of(root):
+        # In stable-output mode the manifest has the latest run; the file may embed an older time
+        stamp = run_stamp(xml_path)
+        if stamp:
+            return stamp
+        elem = root.find('.//last_updated')
+        return elem.text if elem is not None else None
+
     try:
         tree = parse_xml_file(xml_path)
         root = tree.getroot()
@@ -410,9 +421,9 @@ def get_last_updated_from_xml(xml_path, browser, channel=None):
                     if release_elem is not None and release_elem.text:
                         return format_date(release_elem.text)
             # fallback to <last_updated>
-            elem = root.find('.//last_updated')
-            if elem is not None and elem.text:
-                return format_date(elem.text)
+            stamp = last_updated_of(root)
+            if stamp:
+                return format_date(stamp)
         elif browser == 'Edge':
             # Match Date for the requested channel (stable->current)
             channel_map = {'stable': 'current', 'beta': 'beta', 'dev': 'dev', 'canary': 'canary'}
@@ -436,9 +447,9 @@ def get_last_updated_from_xml(xml_path, browser, channel=None):
             if release_released is not None and release_released.text:
                 return format_date(release_released.text)
         # Global fallbacks
-        elem = root.find('.//last_updated')
-        if elem is not None and elem.text:
-            return format_date(elem.text)
+        stamp = last_updated_of(root)
+        if stamp:
+            return format_date(stamp)
         mtime = os.path.getmtime(xml_path)
         return datetime.fromtimestamp(mtime).strftime("%B %d, %Y")
     except Exception as e:
@@ -529,18 +540,19 @@ def generate_readme():
     current_time = datetime.now(eastern).strftime("%B %d, %Y %I:%M %p %Z")
     global_last_updated = current_time
 
-    # Fetch versions and download URLs with new Edge mapping
-    chrome_version, chrome_download = fetch_chrome_details(xml_files['Chrome'], 'stable/version', 'stable/download_link')
-    firefox_version, firefox_download = fetch_firefox_details(xml_files['Firefox'], 'stable', 'stable')
-    edge_version, edge_download = fetch_edge_details(xml_files['Edge'], 'stable', 'stable')
-    # Use the new release-based Safari fetcher (main browser tile)
-    safari_version, safari_download = fetch_safari_release(xml_files['Safari'])
+    with span("parse"):
+        # Fetch versions and download URLs with new Edge mapping
+        chrome_version, chrome_download = fetch_chrome_details(xml_files['Chrome'], 'stable/version', 'stable/download_link')
+        firefox_version, firefox_download = fetch_firefox_details(xml_files['Firefox'], 'stable', 'stable')
+        edge_version, edge_download = fetch_edge_details(xml_files['Edge'], 'stable', 'stable')
+        # Use the new release-based Safari fetcher (main browser tile)
+        safari_version, safari_download = fetch_safari_release(xml_files['Safari'])
 
-    # Fetch last updated dates from XMLs (browser-specific, channel-specific)
-    chrome_last_updated = get_last_updated_from_xml(xml_files['Chrome'], 'Chrome', 'stable')
-    firefox_last_updated = get_last_updated_from_xml(xml_files['Firefox'], 'Firefox', 'stable')
-    edge_last_updated = get_last_updated_from_xml(xml_files['Edge'], 'Edge')
-    safari_last_updated = get_last_updated_from_xml(xml_files['Safari'], 'Safari')
+        # Fetch last updated dates from XMLs (browser-specific, channel-specific)
+        chrome_last_updated = get_last_updated_from_xml(xml_files['Chrome'], 'Chrome', 'stable')
+        firefox_last_updated = get_last_updated_from_xml(xml_files['Firefox'], 'Firefox', 'stable')
+        edge_last_updated = get_last_updated_from_xml(xml_files['Edge'], 'Edge')
+        safari_last_updated = get_last_updated_from_xml(xml_files['Safari'], 'Safari')
 
     readme_content = f"""# **BOFA**
 **B**rowser **O**verview **F**eed for **A**pple
@@ -597,16 +609,17 @@ We welcome community contributions—fork the repository, ask questions, or shar
 
 """
 
-    readme_content += generate_browser_table(base_path)
-    # Add a dedicated Safari releases table (all <release> entries)
-    readme_content += generate_safari_releases_table(base_path, xml_files['Safari'])
-    # Append the new Safari Technology Preview table (if any)
-    readme_content += generate_safari_tech_table(base_path, xml_files['Safari'])
-    readme_content += generate_settings_section()
-
     readme_path = os.path.join(base_path, 'README.md')
-    with open(readme_path, 'w', encoding='utf-8') as f:
-        f.write(readme_content)
+    with span("serialize", path=readme_path):
+        readme_content += generate_browser_table(base_path)
+        # Add a dedicated Safari releases table (all <release> entries)
+        readme_content += generate_safari_releases_table(base_path, xml_files['Safari'])
+        # Append the new Safari Technology Preview table (if any)
+        readme_content += generate_safari_tech_table(base_path, xml_files['Safari'])
+        readme_content += generate_settings_section()
+
+    with span("write", path=readme_path):
+        write_text(readme_path, readme_content, encoding='utf-8')
 
 if __name__ == "__main__":
     generate_readme()
@@ -1,6 +1,8 @@
 import xml.etree.ElementTree as ET
 from datetime import datetime
 import os
+from run_report import span
+from stream_writers import write_stream
 
 # Get the root directory of the project (assuming the script is inside a subfolder like '/update_readme_scripts/')
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -124,9 +126,6 @@ def parse_firefox_packages():
             })
     return pkgs
 
-# Combine all browser packages
-PACKAGES = parse_chrome_packages() + parse_edge_packages() + parse_firefox_packages()
-
 # --- End new code for browser XML parsing ---
 
 # Helper: get all textual content from an element (text + children text/tails)
@@ -159,10 +158,9 @@ def _ensure_feed_exists(feed_path: str) -> None:
     if not os.path.exists(feed_path) or os.path.getsize(feed_path) == 0:
         rss = ET.Element('rss', {'version': '2.0', 'xmlns:atom': 'http://www.w3.org/2005/Atom'})
         ET.SubElement(rss, 'channel')
-        tree = ET.ElementTree(rss)
         indent(rss)
         os.makedirs(os.path.dirname(feed_path), exist_ok=True)
-        tree.write(feed_path, encoding='UTF-8', xml_declaration=True)
+        write_stream(feed_path, [ET.tostring(rss, encoding='UTF-8', xml_declaration=True)])
 
 def _find_package_node(root: ET.Element, package_name: str):
     for package in root.findall('package'):
@@ -334,15 +332,24 @@ def _update_rss_for_package(pkg_conf: dict) -> None:
         print(f"{pkg_conf['name']}: RSS feed updated with new version")
 
     # Always write updates (even if only header normalization happened)
-    indent(rss_root)
-    rss_tree.write(feed_path, encoding='UTF-8', xml_declaration=True)
+    with span("write", path=feed_path):
+        indent(rss_root)
+        write_stream(feed_path, [ET.tostring(rss_root, encoding='UTF-8', xml_declaration=True)])
 
     print(f"Wrote RSS feed to {feed_path}")
 
-# Process each configured package
-for pkg in PACKAGES:
-    # No need to look up in latest.xml; use the pkg_conf fields directly
-    if not pkg.get('short_version') or not pkg.get('update_download'):
-        print(f"{pkg['name']}: missing version or download; skipping.")
-        continue
-    _update_rss_for_package(pkg)
\ No newline at end of file
+def main():
+    # Combine all browser packages
+    with span("parse"):
+        packages = parse_chrome_packages() + parse_edge_packages() + parse_firefox_packages()
+
+    # Process each configured package
+    for pkg in packages:
+        # No need to look up in latest.xml; use the pkg_conf fields directly
+        if not pkg.get('short_version') or not pkg.get('update_download'):
+            print(f"{pkg['name']}: missing version or download; skipping.")
+            continue
+        _update_rss_for_package(pkg)
+
+if __name__ == "__main__":
+    main()
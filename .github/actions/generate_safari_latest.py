@@ -1,24 +1,37 @@
 import requests
-import gzip
-import plistlib
+import base64
+import hashlib
+import tempfile
+import zlib
 from datetime import datetime
+from xml.parsers.expat import ParserCreate
 import pytz
 import os
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 import json
-import yaml
 from collections import defaultdict
 from html.parser import HTMLParser
 import re
 import copy
 import logging
+from fallback_store import fallback_enabled, report_stale
+from http_cache import cached_stream
+from build_graph import digest, run_step
+from http_client import fetch_json, new_session
+from request_coalescer import COALESCER
+from run_report import span
+from serializers import dump_json, dump_yaml
+from stream_writers import write_text
+from xml_writer import pretty_xml
 
 # Use a very simple, human-friendly log output (message only)
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
+# Extracted Safari products from the last parsed catalog, kept by the workflow cache
+CATALOG_SNAPSHOT_PATH = os.path.join(".cache", "safari_catalog_snapshot.json")
+
 def get_session():
-    session = requests.Session()
+    session = new_session()
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -360,7 +373,7 @@ def xml_to_yaml(xml_str):
             safari_versions = {'last_updated': last_updated, **safari_versions}
             data_dict['safari_versions'] = safari_versions
 
-        return yaml.dump(data_dict, default_flow_style=False, sort_keys=False)
+        return dump_yaml(data_dict, default_flow_style=False, sort_keys=False)
     except Exception as e:
         logging.error(f"Error converting XML to YAML: {e}")
         return None
@@ -372,10 +385,8 @@ def fetch_safari_release_notes_index(json_url="https://developer.apple.com/tutor
     Each item contains: major_version, release_notes (identifier), release_notes_url (if found),
     title, released date, and version (e.g. "18.6 (20621.3.11)" or "26.1 beta (20622.2.5)").
     """
-    session = get_session()
-    resp = session.get(json_url)
-    resp.raise_for_status()
-    data = resp.json()
+    # Called several times per run; the coalescer serves the repeats from one request and one parse
+    data = fetch_json(json_url, get_session())
 
     refs = data.get("references", {}) or {}
     results = []
@@ -508,23 +519,227 @@ def notes_to_xml(notes):
 			other = ET.SubElement(release, k)
 			other.text = str(v)
 	# pretty-print
-	xml_bytes = ET.tostring(root, encoding='utf-8')
-	pretty = minidom.parseString(xml_bytes).toprettyxml(indent="  ")
+	pretty = pretty_xml(root)
 	return pretty
 
+def decompressed_chunks(chunks, max_length=64 * 1024):
+    """
+    Pass chunks through, gunzipping on the fly when the body is still gzip data (.sucatalog.gz).
+    Decompressed output is handed out in pieces of at most max_length bytes.
+    """
+    decompressor = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if decompressor is None:
+            # gzip magic bytes: 1f 8b
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+        if not decompressor:
+            yield chunk
+            continue
+        data = decompressor.decompress(chunk, max_length)
+        while data:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail, max_length)
+    if decompressor:
+        yield decompressor.flush()
+
+class SafariCatalogParser:
+    """
+    Incremental expat parser for a software-update catalog plist.
+    Builds the same Python values plistlib would, but each entry of the top-level Products dict
+    is checked as soon as its </dict> is parsed: Safari products (ExtendedMetaInfo.ProductType
+    == 'Safari') are queued in self.matches, every other product is dropped immediately.
+    """
+
+    def __init__(self):
+        self.parser = ParserCreate()
+        self.parser.StartElementHandler = self.handle_start
+        self.parser.EndElementHandler = self.handle_end
+        self.parser.CharacterDataHandler = self.handle_data
+        self.stack = []
+        self.keys = []
+        self.data = []
+        self.products = None
+        self.matches = []
+
+    def feed(self, chunk, final=False):
+        self.parser.Parse(chunk, final)
+
+    def handle_start(self, tag, attrs):
+        self.data = []
+        if tag in ('dict', 'array'):
+            container = {} if tag == 'dict' else []
+            # plist > top-level dict > Products dict
+            if tag == 'dict' and len(self.stack) == 1 and self.keys[-1] == 'Products':
+                self.products = container
+            self.stack.append(container)
+            self.keys.append(None)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_end(self, tag):
+        text = "".join(self.data)
+        self.data = []
+        if tag == 'key':
+            self.keys[-1] = text
+            return
+        if tag in ('dict', 'array'):
+            value = self.stack.pop()
+            self.keys.pop()
+            if self.stack and self.stack[-1] is self.products:
+                meta_info = value.get('ExtendedMetaInfo') if isinstance(value, dict) else None
+                if isinstance(meta_info, dict) and meta_info.get('ProductType') == 'Safari':
+                    self.matches.append((self.keys[-1], value))
+                return
+        elif tag == 'string':
+            value = text
+        elif tag == 'integer':
+            value = int(text)
+        elif tag == 'real':
+            value = float(text)
+        elif tag == 'true':
+            value = True
+        elif tag == 'false':
+            value = False
+        elif tag == 'date':
+            value = datetime.strptime(text, '%Y-%m-%dT%H:%M:%SZ')
+        elif tag == 'data':
+            value = base64.b64decode(text)
+        else:
+            return
+        if not self.stack:
+            return
+        parent = self.stack[-1]
+        if isinstance(parent, dict):
+            parent[self.keys[-1]] = value
+        else:
+            parent.append(value)
+
+def iter_safari_products(chunks):
+    """
+    Stream-parse a (possibly gzipped) catalog and yield (product_id, product_info) for Safari products only,
+    so memory use follows the Safari subset instead of the whole software-update catalog.
+    """
+    parser = SafariCatalogParser()
+    for chunk in decompressed_chunks(chunks):
+        parser.feed(chunk)
+        if parser.matches:
+            yield from parser.matches
+            parser.matches = []
+    parser.feed(b'', final=True)
+    yield from parser.matches
+
+def extract_package_records(product_info):
+    """
+    Return the fields the outputs need from one Safari product: one record per package with
+    os, version, URL, Size (bytes) and PostDate (formatted, or None).
+    """
+    records = []
+    post_date = None
+    if 'PostDate' in product_info:
+        post_date = product_info['PostDate'].strftime('%B %d, %Y %I:%M %p')
+    for package in product_info.get('Packages', []):
+        if 'URL' in package and 'Size' in package:
+            os_name = extract_os_from_url(package['URL'])
+            if not os_name or os_name == "Unknown":
+                continue
+            records.append({
+                "os": os_name,
+                "version": extract_version_from_url(package['URL']),
+                "URL": package['URL'],
+                "Size": package['Size'],
+                "PostDate": post_date
+            })
+    return records
+
+def product_fingerprint(product_info):
+    return hashlib.sha256(json.dumps(product_info, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def load_catalog_snapshot():
+    try:
+        with open(CATALOG_SNAPSHOT_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_catalog_snapshot(snapshot):
+    os.makedirs(os.path.dirname(CATALOG_SNAPSHOT_PATH), exist_ok=True)
+    with open(CATALOG_SNAPSHOT_PATH, 'w') as f:
+        json.dump(snapshot, f)
+
+def spool_and_hash(chunks):
+    """Copy chunks to a temporary file while hashing them; returns (file rewound to 0, 'sha256:<hex>')."""
+    digest = hashlib.sha256()
+    spool = tempfile.TemporaryFile()
+    for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, f"sha256:{digest.hexdigest()}"
+
+def snapshot_records(snapshot):
+    return [record for product_id in snapshot.get("order", []) for record in snapshot["products"][product_id]["records"]]
+
+def load_safari_records(catalog_url):
+    """
+    Return the Safari package records for the catalog, in catalog order.
+    The extracted records are snapshotted together with the catalog's ETag / Last-Modified
+    (or a content hash when the server sends neither). An unchanged catalog skips the plist
+    parse entirely; a changed one is parsed and only new or modified products are re-extracted.
+    If the catalog cannot be fetched, the snapshot's records are served as a stale payload.
+    """
+    snapshot = load_catalog_snapshot()
+    if snapshot.get("catalog_url") != catalog_url:
+        snapshot = {}
+    try:
+        chunks, info = cached_stream(get_session(), catalog_url)
+    except requests.RequestException as e:
+        if not snapshot or not fallback_enabled():
+            raise
+        report_stale(catalog_url, f"{type(e).__name__}: {e}")
+        return snapshot_records(snapshot)
+    validator = info.get("etag") or info.get("last_modified")
+    spool = None
+    if not validator:
+        spool, validator = spool_and_hash(chunks)
+        chunks = iter(lambda: spool.read(64 * 1024), b'')
+    try:
+        if snapshot.get("validator") == validator:
+            if not info.get("from_cache") and spool is None:
+                # Consume the body so the HTTP cache stores it for the next conditional request
+                for _ in chunks:
+                    pass
+            logging.info("Safari catalog unchanged; reusing extracted products.")
+            return snapshot_records(snapshot)
+
+        previous = snapshot.get("products", {})
+        products = {}
+        order = []
+        reused = 0
+        with span("parse"):
+            for product_id, product_info in iter_safari_products(chunks):
+                fingerprint = product_fingerprint(product_info)
+                known = previous.get(product_id)
+                if known and known.get("fingerprint") == fingerprint:
+                    records = known["records"]
+                    reused += 1
+                else:
+                    records = extract_package_records(product_info)
+                products[product_id] = {"fingerprint": fingerprint, "records": records}
+                order.append(product_id)
+        logging.info(f"Safari catalog changed: {len(order)} Safari products, {len(order) - reused} new or modified.")
+    finally:
+        if spool is not None:
+            spool.close()
+    snapshot = {"catalog_url": catalog_url, "validator": validator, "order": order, "products": products}
+    save_catalog_snapshot(snapshot)
+    return snapshot_records(snapshot)
+
 def get_latest_safari_version(catalog_url):
     try:
-        session = get_session()
-        response = session.get(catalog_url)
-        response.raise_for_status()
-        
-        # Check if the content is gzipped
-        if response.headers.get('Content-Encoding') == 'gzip':
-            plist_content = gzip.decompress(response.content)
-        else:
-            plist_content = response.content
-        
-        catalog = plistlib.loads(plist_content)
+        safari_records = load_safari_records(catalog_url)
         root = ET.Element('safari_versions')
         
         # Add last_updated element
@@ -533,38 +748,28 @@ def get_latest_safari_version(catalog_url):
         current_time = datetime.now(eastern).strftime('%B %d, %Y %I:%M %p %Z')
         last_updated.text = current_time
         
-        for product_id, product_info in catalog['Products'].items():
-            if 'ExtendedMetaInfo' in product_info:
-                meta_info = product_info['ExtendedMetaInfo']
-                if meta_info.get('ProductType') == 'Safari':
-                    if 'Packages' in product_info:
-                        for package in product_info['Packages']:
-                            if 'URL' in package and 'Size' in package:
-                                os_name = extract_os_from_url(package['URL'])
-                                if not os_name or os_name == "Unknown":
-                                    continue
-                                
-                                # Use a generic <release> element and include the OS as a child
-                                packages = ET.SubElement(root, 'release')
-                                os_elem = ET.SubElement(packages, 'os')
-                                os_elem.text = os_name
-                                
-                                # Extract and add version
-                                version = ET.SubElement(packages, 'version')
-                                version.text = extract_version_from_url(package['URL'])
-                                
-                                # Add URL
-                                url_elem = ET.SubElement(packages, 'URL')
-                                url_elem.text = package['URL']
-                                
-                                # Convert and add Size
-                                size_elem = ET.SubElement(packages, 'Size')
-                                size_elem.text = bytes_to_mb(package['Size'])
-                                
-                                # Format and add PostDate
-                                if 'PostDate' in product_info:
-                                    post_date = ET.SubElement(packages, 'PostDate')
-                                    post_date.text = product_info['PostDate'].strftime('%B %d, %Y %I:%M %p')
+        for record in safari_records:
+            # Use a generic <release> element and include the OS as a child
+            packages = ET.SubElement(root, 'release')
+            os_elem = ET.SubElement(packages, 'os')
+            os_elem.text = record["os"]
+            
+            # Extracted version
+            version = ET.SubElement(packages, 'version')
+            version.text = record["version"]
+            
+            # Add URL
+            url_elem = ET.SubElement(packages, 'URL')
+            url_elem.text = record["URL"]
+            
+            # Convert and add Size
+            size_elem = ET.SubElement(packages, 'Size')
+            size_elem.text = bytes_to_mb(record["Size"])
+            
+            # Add PostDate
+            if record["PostDate"] is not None:
+                post_date = ET.SubElement(packages, 'PostDate')
+                post_date.text = record["PostDate"]
         
         # Add Safari_Technology_Preview entries from live scrape
         tp_info = fetch_technology_preview_info()
@@ -607,7 +812,8 @@ def get_latest_safari_version(catalog_url):
             logging.warning(f"downloads scrape failed: {e}")
 
         # Convert to pretty XML string
-        xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
+        with span("serialize"):
+            xml_str = pretty_xml(root)
         return xml_str
     
     except Exception as e:
@@ -615,20 +821,151 @@ def get_latest_safari_version(catalog_url):
         return None
 
 def export_to_file(content, filepath):
-    with open(filepath, 'w', encoding='utf-8') as file:
-        file.write(content)
+    with span("write", path=filepath):
+        write_text(filepath, content, encoding='utf-8')
 
-# NEW: fetch Safari release-notes index and write top item per major version
-try:
-    notes = fetch_safari_release_notes_index()
-    if notes:
+# Replace __main__ to only run the catalog + export flow (no preview-only helpers)
+CATALOG_OUTPUTS = [f"latest_safari_files/{name}.{ext}" for name in ("safari_all_catalog_pkg", "safari_latest_versions") for ext in ("xml", "json", "yaml")]
+HISTORY_OUTPUTS = [f"latest_safari_files/safari_all_history.{ext}" for ext in ("xml", "json", "yaml")]
+
+def write_catalog_files(safari_xml, notes):
+    """
+    Write the catalog package files and the latest-versions files (Technology Preview entries
+    plus the chosen release per major version from notes, the release-notes index).
+    """
+    # Build and write catalog package outputs WITHOUT Safari_Technology_Preview entries.
+    # Keep original safari_xml intact for creating the Technology Preview "latest_versions" file below.
+    try:
+        catalog_root = ET.fromstring(safari_xml)
+        # remove any Safari_Technology_Preview children
+        for stp in catalog_root.findall('Safari_Technology_Preview'):
+            catalog_root.remove(stp)
+        # pretty-print and export filtered catalog
+        with span("serialize", path='latest_safari_files/safari_all_catalog_pkg.xml'):
+            catalog_xml_raw = pretty_xml(catalog_root)
+            catalog_xml = "\n".join([ln for ln in catalog_xml_raw.splitlines() if ln.strip() != ""])
+        export_to_file(catalog_xml, 'latest_safari_files/safari_all_catalog_pkg.xml')
+        with span("serialize", path='latest_safari_files/safari_all_catalog_pkg.json'):
+            catalog_json = xml_to_json(catalog_xml)
+        if catalog_json:
+            export_to_file(catalog_json, 'latest_safari_files/safari_all_catalog_pkg.json')
+        with span("serialize", path='latest_safari_files/safari_all_catalog_pkg.yaml'):
+            catalog_yaml = xml_to_yaml(catalog_xml)
+        if catalog_yaml:
+            export_to_file(catalog_yaml, 'latest_safari_files/safari_all_catalog_pkg.yaml')
+    except Exception as e:
+        # fallback to writing the raw xml if filtering fails
+        export_to_file(safari_xml, 'latest_safari_files/safari_all_catalog_pkg.xml')
+        safari_json = xml_to_json(safari_xml)
+        if safari_json:
+            export_to_file(safari_json, 'latest_safari_files/safari_all_catalog_pkg.json')
+        safari_yaml = xml_to_yaml(safari_xml)
+        if safari_yaml:
+            export_to_file(safari_yaml, 'latest_safari_files/safari_all_catalog_pkg.yaml')
+
+    # NEW: create a "latest_versions" output containing ONLY Safari_Technology_Preview entries
+    try:
+        # parse original catalog xml
+        root = ET.fromstring(safari_xml)
+        new_root = ET.Element(root.tag)  # keep same root name, e.g. 'safari_versions'
+        # copy last_updated if present
+        lu = root.find('last_updated')
+        if lu is not None:
+            new_lu = ET.SubElement(new_root, 'last_updated')
+            new_lu.text = lu.text
+
+        # append Technology Preview entries (deep copy)
+        for elem in root.findall('Safari_Technology_Preview'):
+            new_root.append(copy.deepcopy(elem))
+
+        # Group items by major_version
+        groups = defaultdict(list)
+        for it in notes:
+            groups[it.get("major_version")].append(it)
+
+        def numeric_key(vstr):
+            m = re.search(r'([0-9]+(?:\.[0-9]+)*)', (vstr or ""))
+            if not m:
+                return ()
+            return tuple(int(p) for p in m.group(1).split('.'))
+
+        # For each major, choose highest non-beta; also include beta items
+        for major, items in groups.items():
+            non_beta = [i for i in items if not re.search(r'\bbeta\b', i.get("version",""), re.I)]
+            chosen = None
+            if non_beta:
+                chosen = max(non_beta, key=lambda x: numeric_key(x.get("version","")))
+            else:
+                # fallback to highest including beta if no non-beta present
+                chosen = max(items, key=lambda x: numeric_key(x.get("version","")))
+
+            # collect final list: chosen non-beta + any beta items (if present and not same as chosen)
+            selected = []
+            if chosen:
+                selected.append(chosen)
+            betas = [i for i in items if re.search(r'\bbeta\b', i.get("version",""), re.I)]
+            for b in betas:
+                # avoid duplicate if chosen is the same
+                if b is not chosen:
+                    selected.append(b)
+
+            # append each selected release as <release> under new_root
+            for sel in selected:
+                rel = ET.SubElement(new_root, 'release')
+                mv = ET.SubElement(rel, 'major_version')
+                mv.text = str(sel.get('major_version',''))
+                fv = ET.SubElement(rel, 'full_version')
+                fv.text = str(sel.get('version',''))
+                rd = ET.SubElement(rel, 'released')
+                rd.text = str(sel.get('released',''))
+                # ensure release_notes element contains the URL when available
+                rn = ET.SubElement(rel, 'release_notes')
+                rn.text = str(sel.get('release_notes_url') or sel.get('release_notes',''))
+
+        # normalize whitespace to avoid extra blank lines
+        def _strip_whitespace(node):
+            if node.text is not None and node.text.strip() == "":
+                node.text = None
+            if node.tail is not None and node.tail.strip() == "":
+                node.tail = None
+            for c in list(node):
+                _strip_whitespace(c)
+        _strip_whitespace(new_root)
+
+        # pretty-print and export
+        with span("serialize", path='latest_safari_files/safari_latest_versions.xml'):
+            pretty_raw = pretty_xml(new_root)
+            latest_xml = "\n".join([ln for ln in pretty_raw.splitlines() if ln.strip() != ""])
+        export_to_file(latest_xml, 'latest_safari_files/safari_latest_versions.xml')
+
+        with span("serialize", path='latest_safari_files/safari_latest_versions.json'):
+            latest_json = xml_to_json(latest_xml)
+        if latest_json:
+            export_to_file(latest_json, 'latest_safari_files/safari_latest_versions.json')
+        with span("serialize", path='latest_safari_files/safari_latest_versions.yaml'):
+            latest_yaml = xml_to_yaml(latest_xml)
+        if latest_yaml:
+            export_to_file(latest_yaml, 'latest_safari_files/safari_latest_versions.yaml')
+    except Exception as e:
+        logging.warning(f"failed to extract Safari_Technology_Preview entries or add selected releases: {e}")
+
+def write_all_history_files(notes):
+    """
+    Write the release-notes index as the safari_all_history XML, JSON and YAML files.
+    """
+    try:
         os.makedirs('latest_safari_files', exist_ok=True)
         # write real XML instead of JSON-in-XML
-        xml_out = notes_to_xml(notes)
+        with span("serialize", path='latest_safari_files/safari_all_history.xml'):
+            xml_out = notes_to_xml(notes)
         export_to_file(xml_out, 'latest_safari_files/safari_all_history.xml')
         # NEW: also write JSON and YAML representations
-        export_to_file(json.dumps(notes, indent=2), 'latest_safari_files/safari_all_history.json')
-        export_to_file(yaml.dump(notes, default_flow_style=False, sort_keys=False), 'latest_safari_files/safari_all_history.yaml')
+        with span("serialize", path='latest_safari_files/safari_all_history.json'):
+            json_out = dump_json(notes)
+        export_to_file(json_out, 'latest_safari_files/safari_all_history.json')
+        with span("serialize", path='latest_safari_files/safari_all_history.yaml'):
+            yaml_out = dump_yaml(notes, default_flow_style=False, sort_keys=False)
+        export_to_file(yaml_out, 'latest_safari_files/safari_all_history.yaml')
         # Log a short, simple summary for each history item
         for item in notes:
             mv = item.get("major_version")
@@ -636,150 +973,35 @@ try:
             released = item.get("released") or ""
             version = item.get("version") or ""
             logging.info(f"History: {mv} — {title} — {version} — {released}")
-except Exception as e:
-    logging.warning(f"failed to fetch release-notes index: {e}")
+    except Exception as e:
+        logging.warning(f"failed to write release-notes history: {e}")
 
-# Replace __main__ to only run the catalog + export flow (no preview-only helpers)
-if __name__ == "__main__":
+def main():
+    """
+    Write the Safari catalog, latest-versions and release-history files.
+    """
     # Generate latest Safari versions XML/JSON/YAML from Apple catalog + Technology Preview scraping
     catalog_url = 'https://swscan.apple.com/content/catalogs/others/index-15-14-13-12-10.16-10.15-10.14-10.13-10.12-10.11-10.10-10.9-mountainlion-lion-snowleopard-leopard.merged-1.sucatalog.gz'
     safari_xml = get_latest_safari_version(catalog_url)
+    if not safari_xml:
+        # Fail rather than leave the catalog files out; run_pipeline keeps the last good ones
+        raise RuntimeError("Safari catalog could not be fetched or parsed")
+
+    # The latest-versions files pick one release per major (+ betas) from the release-notes list,
+    # which is also written out as the release history. Without it they would lose every release.
+    notes = fetch_safari_release_notes_index()
 
     if safari_xml:
-        # Build and write catalog package outputs WITHOUT Safari_Technology_Preview entries.
-        # Keep original safari_xml intact for creating the Technology Preview "latest_versions" file below.
-        try:
-            catalog_root = ET.fromstring(safari_xml)
-            # remove any Safari_Technology_Preview children
-            for stp in catalog_root.findall('Safari_Technology_Preview'):
-                catalog_root.remove(stp)
-            # pretty-print and export filtered catalog
-            catalog_xml_raw = minidom.parseString(ET.tostring(catalog_root, encoding='utf-8')).toprettyxml(indent="  ")
-            catalog_xml = "\n".join([ln for ln in catalog_xml_raw.splitlines() if ln.strip() != ""])
-            export_to_file(catalog_xml, 'latest_safari_files/safari_all_catalog_pkg.xml')
-            catalog_json = xml_to_json(catalog_xml)
-            if catalog_json:
-                export_to_file(catalog_json, 'latest_safari_files/safari_all_catalog_pkg.json')
-            catalog_yaml = xml_to_yaml(catalog_xml)
-            if catalog_yaml:
-                export_to_file(catalog_yaml, 'latest_safari_files/safari_all_catalog_pkg.yaml')
-        except Exception as e:
-            # fallback to writing the raw xml if filtering fails
-            export_to_file(safari_xml, 'latest_safari_files/safari_all_catalog_pkg.xml')
-            safari_json = xml_to_json(safari_xml)
-            if safari_json:
-                export_to_file(safari_json, 'latest_safari_files/safari_all_catalog_pkg.json')
-            safari_yaml = xml_to_yaml(safari_xml)
-            if safari_yaml:
-                export_to_file(safari_yaml, 'latest_safari_files/safari_all_catalog_pkg.yaml')
-
-        # NEW: create a "latest_versions" output containing ONLY Safari_Technology_Preview entries
-        try:
-            # parse original catalog xml
-            root = ET.fromstring(safari_xml)
-            new_root = ET.Element(root.tag)  # keep same root name, e.g. 'safari_versions'
-            # copy last_updated if present
-            lu = root.find('last_updated')
-            if lu is not None:
-                new_lu = ET.SubElement(new_root, 'last_updated')
-                new_lu.text = lu.text
-
-            # append Technology Preview entries (deep copy)
-            for elem in root.findall('Safari_Technology_Preview'):
-                new_root.append(copy.deepcopy(elem))
-
-            # Fetch release-notes list so we can pick one "chosen" per major + include beta(s)
-            try:
-                notes = fetch_safari_release_notes_index()
-            except Exception:
-                notes = []
-
-            # Group items by major_version
-            groups = defaultdict(list)
-            for it in notes:
-                groups[it.get("major_version")].append(it)
-
-            def numeric_key(vstr):
-                m = re.search(r'([0-9]+(?:\.[0-9]+)*)', (vstr or ""))
-                if not m:
-                    return ()
-                return tuple(int(p) for p in m.group(1).split('.'))
-
-            # For each major, choose highest non-beta; also include beta items
-            for major, items in groups.items():
-                non_beta = [i for i in items if not re.search(r'\bbeta\b', i.get("version",""), re.I)]
-                chosen = None
-                if non_beta:
-                    chosen = max(non_beta, key=lambda x: numeric_key(x.get("version","")))
-                else:
-                    # fallback to highest including beta if no non-beta present
-                    chosen = max(items, key=lambda x: numeric_key(x.get("version","")))
-
-                # collect final list: chosen non-beta + any beta items (if present and not same as chosen)
-                selected = []
-                if chosen:
-                    selected.append(chosen)
-                betas = [i for i in items if re.search(r'\bbeta\b', i.get("version",""), re.I)]
-                for b in betas:
-                    # avoid duplicate if chosen is the same
-                    if b is not chosen:
-                        selected.append(b)
-
-                # append each selected release as <release> under new_root
-                for sel in selected:
-                    rel = ET.SubElement(new_root, 'release')
-                    mv = ET.SubElement(rel, 'major_version')
-                    mv.text = str(sel.get('major_version',''))
-                    fv = ET.SubElement(rel, 'full_version')
-                    fv.text = str(sel.get('version',''))
-                    rd = ET.SubElement(rel, 'released')
-                    rd.text = str(sel.get('released',''))
-                    # ensure release_notes element contains the URL when available
-                    rn = ET.SubElement(rel, 'release_notes')
-                    rn.text = str(sel.get('release_notes_url') or sel.get('release_notes',''))
-
-            # normalize whitespace to avoid extra blank lines
-            def _strip_whitespace(node):
-                if node.text is not None and node.text.strip() == "":
-                    node.text = None
-                if node.tail is not None and node.tail.strip() == "":
-                    node.tail = None
-                for c in list(node):
-                    _strip_whitespace(c)
-            _strip_whitespace(new_root)
-
-            # pretty-print and export
-            pretty_raw = minidom.parseString(ET.tostring(new_root, encoding='utf-8')).toprettyxml(indent="  ")
-            latest_xml = "\n".join([ln for ln in pretty_raw.splitlines() if ln.strip() != ""])
-            export_to_file(latest_xml, 'latest_safari_files/safari_latest_versions.xml')
+        # Apart from its last_updated stamp, the catalog XML is built only from the fetched payloads
+        catalog_digest = digest(re.sub(r"<last_updated>.*?</last_updated>", "", safari_xml))
+        run_step("safari_catalog", {"catalog": catalog_digest, "release_notes": digest(notes)}, CATALOG_OUTPUTS,
+                 lambda: write_catalog_files(safari_xml, notes))
 
-            latest_json = xml_to_json(latest_xml)
-            if latest_json:
-                export_to_file(latest_json, 'latest_safari_files/safari_latest_versions.json')
-            latest_yaml = xml_to_yaml(latest_xml)
-            if latest_yaml:
-                export_to_file(latest_yaml, 'latest_safari_files/safari_latest_versions.yaml')
-        except Exception as e:
-            logging.warning(f"failed to extract Safari_Technology_Preview entries or add selected releases: {e}")
+    # NEW: write Safari release-notes index (top item per major version)
+    if notes:
+        run_step("safari_all_history", {"release_notes": digest(notes)}, HISTORY_OUTPUTS, lambda: write_all_history_files(notes))
 
-    # NEW: fetch Safari release-notes index and write top item per major version
-    try:
-        notes = fetch_safari_release_notes_index()
-        if notes:
-            os.makedirs('latest_safari_files', exist_ok=True)
-            # write real XML instead of JSON-in-XML
-            xml_out = notes_to_xml(notes)
-            export_to_file(xml_out, 'latest_safari_files/safari_all_history.xml')
-            # NEW: also write JSON and YAML representations
-            export_to_file(json.dumps(notes, indent=2), 'latest_safari_files/safari_all_history.json')
-            export_to_file(yaml.dump(notes, default_flow_style=False, sort_keys=False), 'latest_safari_files/safari_all_history.yaml')
-            # Log a short, simple summary for each history item
-            for item in notes:
-                mv = item.get("major_version")
-                title = item.get("title") or item.get("release_notes")
-                released = item.get("released") or ""
-                version = item.get("version") or ""
-                logging.info(f"History: {mv} — {title} — {version} — {released}")
-    except Exception as e:
-        logging.warning(f"failed to fetch release-notes index: {e}")
+    logging.info(COALESCER.report())
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from fallback_store import budget_deadline, fallback_enabled, get_with_fallback, report_stale
+from request_coalescer import COALESCER
+from resilience import CURRENT_DEADLINE, RETRY_STATUSES, request_with_retries
+
+# On-disk conditional-GET cache shared by all generators.
+# Each entry is a <key>.json metadata file (URL, validators, headers) plus a <key>.body file.
+# The workflow restores/saves this directory between runs with actions/cache.
+# GETs also keep a last-known-good copy of each payload to serve when the vendor fails or is too
+# slow (see fallback_store.py); a streamed GET falls back to its cached body the same way.
+CACHE_DIR = os.environ.get("BOFA_HTTP_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "http"))
+CACHE_MAX_BYTES = int(os.environ.get("BOFA_HTTP_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+CACHE_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_saved": 0}
+
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+# {key: body size} of the entries on disk and their total, read from the directory by the first
+# store and kept up to date after that, so a store only lists the directory when over the limit
+_entry_sizes = None
+_cache_bytes = 0
+
+def count(stat, amount=1):
+    """Add amount to one of CACHE_STATS (GETs run on several threads)."""
+    with _stats_lock:
+        CACHE_STATS[stat] += amount
+
+def cache_key(url, headers=None):
+    """Hash the URL plus any per-request headers into a cache file name."""
+    parts = [url]
+    for name, value in sorted((headers or {}).items()):
+        parts.append(f"{name.lower()}:{value}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def _paths(key):
+    return os.path.join(CACHE_DIR, f"{key}.json"), os.path.join(CACHE_DIR, f"{key}.body")
+
+def load_entry(key):
+    """Return the cached metadata for a key, or None."""
+    meta_path, body_path = _paths(key)
+    if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+        return None
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def read_body(key):
+    _, body_path = _paths(key)
+    try:
+        with open(body_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _replace_file(path, data):
+    """Write data (bytes) to a temporary file and move it over path, so readers never see a partial file."""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def store_entry(key, url, response):
+    """Persist a 200 response that carries an ETag or Last-Modified validator."""
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    body = response.content
+    if len(body) > CACHE_MAX_BYTES:
+        return
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "headers": dict(response.headers),
+        "size": len(body),
+        "stored_at": time.time(),
+        "used_at": time.time(),
+    }
+    meta_path, body_path = _paths(key)
+    with _lock:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Body first: metadata never names validators for a body that is not fully on disk
+        _replace_file(body_path, body)
+        _replace_file(meta_path, json.dumps(meta).encode("utf-8"))
+        _record_size(key, len(body))
+        count("stores")
+        evict()
+
+def touch_entry(key, entry):
+    meta_path, _ = _paths(key)
+    entry["used_at"] = time.time()
+    with _lock:
+        try:
+            _replace_file(meta_path, json.dumps(entry).encode("utf-8"))
+        except OSError:
+            pass
+
+def _scan_entries():
+    """Return [(used_at, key, size)] for every entry on disk, and reset the running size total from it."""
+    global _entry_sizes, _cache_bytes
+    entries = []
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(CACHE_DIR, name), "r") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append((meta.get("used_at", 0), name[:-len(".json")], meta.get("size", 0)))
+    _entry_sizes = {key: size for _, key, size in entries}
+    _cache_bytes = sum(_entry_sizes.values())
+    return entries
+
+def _record_size(key, size):
+    """Count a just-stored entry in the running size total. Caller holds _lock."""
+    global _cache_bytes
+    if _entry_sizes is None:
+        # The first scan already sees the new entry
+        _scan_entries()
+        return
+    _cache_bytes += size - _entry_sizes.get(key, 0)
+    _entry_sizes[key] = size
+
+def evict(max_bytes=None):
+    """
+    Delete least-recently-used entries until the cache fits in max_bytes. Caller holds _lock.
+    The directory is only read when the running size total is over max_bytes (or not known yet).
+    """
+    global _cache_bytes
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if _entry_sizes is not None and _cache_bytes <= max_bytes:
+        return
+    # Rescanning also picks up entries other worker processes stored or evicted
+    entries = sorted(_scan_entries())
+    while _cache_bytes > max_bytes and entries:
+        _, key, size = entries.pop(0)
+        for path in _paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _cache_bytes -= size
+        del _entry_sizes[key]
+        count("evictions")
+
+def build_cached_response(entry, body, live_response):
+    """Turn a 304 + cached body into a normal 200 requests.Response."""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached.reason = "OK"
+    cached._content = body
+    cached.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    cached.encoding = get_encoding_from_headers(cached.headers)
+    cached.url = entry.get("url", live_response.url)
+    cached.request = live_response.request
+    cached.history = live_response.history
+    cached.elapsed = live_response.elapsed
+    cached.from_cache = True
+    return cached
+
+def cached_get(session, url, headers=None, **kwargs):
+    """
+    GET through the on-disk cache. When a cached copy exists the request is sent with
+    If-None-Match / If-Modified-Since; a 304 returns the cached body as a normal 200 response.
+    """
+    key = cache_key(url, headers)
+    entry = load_entry(key)
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+    response = requests.Session.get(session, url, headers=request_headers, **kwargs)
+    if response.status_code == 304 and entry:
+        body = read_body(key)
+        if body is not None:
+            touch_entry(key, entry)
+            count("hits")
+            count("bytes_saved", len(body))
+            return build_cached_response(entry, body, response)
+        # Body vanished between load and read: fetch it again without validators
+        response = requests.Session.get(session, url, headers=headers, **kwargs)
+    count("misses")
+    if response.status_code == 200:
+        store_entry(key, url, response)
+    return response
+
+def _iter_file(path, chunk_size):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def _tee_to_cache(key, url, response, chunk_size):
+    """Yield the response body while writing it to the cache; the entry is committed only when complete."""
+    meta_path, body_path = _paths(key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+    size = 0
+    completed = False
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+                yield chunk
+        completed = True
+    finally:
+        response.close()
+        if not completed or size > CACHE_MAX_BYTES:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    if size > CACHE_MAX_BYTES:
+        return
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "headers": dict(response.headers),
+        "size": size,
+        "stored_at": time.time(),
+        "used_at": time.time(),
+    }
+    with _lock:
+        os.replace(tmp_path, body_path)
+        _replace_file(meta_path, json.dumps(meta).encode("utf-8"))
+        _record_size(key, size)
+        count("stores")
+        evict()
+
+def _stale_stream(key, entry, url, reason, chunk_size):
+    """Stream the cached body of a failed GET, reported as a stale payload."""
+    _, body_path = _paths(key)
+    touch_entry(key, entry)
+    report_stale(url, reason, entry.get("stored_at"))
+    info = {"from_cache": True, "stale": True, "etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+    return _iter_file(body_path, chunk_size), info
+
+def cached_stream(session, url, headers=None, chunk_size=64 * 1024, **kwargs):
+    """
+    Stream a GET through the on-disk cache without holding the whole body in memory.
+    Returns (chunks, info): chunks iterates over the (Content-Encoding decoded) body and
+    info holds "from_cache", "etag" and "last_modified". A 304 streams the cached file;
+    a 200 with validators is written to the cache while it is being consumed.
+    """
+    key = cache_key(url, headers)
+    entry = load_entry(key)
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+    _, body_path = _paths(key)
+    fallback = fallback_enabled() and entry is not None and os.path.exists(body_path)
+    token = CURRENT_DEADLINE.set(budget_deadline()) if fallback else None
+    try:
+        response = requests.Session.get(session, url, headers=request_headers, stream=True, **kwargs)
+    except requests.RequestException as e:
+        if not fallback:
+            raise
+        return _stale_stream(key, entry, url, f"{type(e).__name__}: {e}", chunk_size)
+    finally:
+        if token is not None:
+            CURRENT_DEADLINE.reset(token)
+    if fallback and response.status_code in RETRY_STATUSES:
+        response.close()
+        return _stale_stream(key, entry, url, f"HTTP {response.status_code}", chunk_size)
+    if response.status_code == 304 and entry and os.path.exists(body_path):
+        response.close()
+        touch_entry(key, entry)
+        count("hits")
+        count("bytes_saved", entry.get("size", 0))
+        info = {"from_cache": True, "etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+        return _iter_file(body_path, chunk_size), info
+    if response.status_code == 304:
+        response.close()
+        response = requests.Session.get(session, url, headers=headers, stream=True, **kwargs)
+    response.raise_for_status()
+    count("misses")
+    info = {
+        "from_cache": False,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    if not info["etag"] and not info["last_modified"]:
+        return response.iter_content(chunk_size), info
+    return _tee_to_cache(key, url, response, chunk_size), info
+
+def request_fingerprint(session, url, headers=None, options=None):
+    """
+    Key identifying a GET within the run: URL plus the session and per-request headers and any
+    other keyword arguments of the request (allow_redirects, timeout, ...).
+    """
+    merged = dict(session.headers)
+    merged.update(headers or {})
+    return ("GET", url, tuple(sorted((k.lower(), str(v)) for k, v in merged.items())),
+            tuple(sorted((name, repr(value)) for name, value in (options or {}).items())))
+
+class CachedSession(requests.Session):
+    """
+    requests.Session whose GETs go through the on-disk conditional cache.
+    Identical GETs within one run are coalesced, so they share one in-flight request and one response.
+    A GET with stream=True bypasses the cache and the coalescer, since its body is read once by the
+    caller (use cached_stream to stream through the cache).
+    Every request gets a default timeout, retries and circuit breaking (see resilience.py), and
+    a GET that fails falls back to the endpoint's last good payload (see fallback_store.py).
+    """
+
+    def request(self, method, url, **kwargs):
+        return request_with_retries(super().request, method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        headers = kwargs.pop("headers", None)
+        params = kwargs.pop("params", None)
+        if params:
+            # Key the disk cache, the fallback store and the coalescer on the full query
+            url = requests.Request("GET", url, params=params).prepare().url
+        if kwargs.get("stream"):
+            return super().get(url, headers=headers, **kwargs)
+        return COALESCER.run(
+            request_fingerprint(self, url, headers, kwargs),
+            lambda: get_with_fallback(cache_key(url, headers), url, lambda: cached_get(self, url, headers=headers, **kwargs)),
+            memo_if=lambda response: response.status_code < 400,
+        )
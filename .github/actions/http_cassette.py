@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+# Record/replay of raw HTTP interactions, so a run can be repeated offline on identical inputs.
+# Set BOFA_RECORD_DIR to capture every response (status, headers, undecoded body) into a cassette
+# directory, or BOFA_REPLAY_DIR to serve them back with no network. run_pipeline.py sets these
+# from --record / --replay.
+#
+# The cassette hooks in at the transport adapter, so each hop of a redirect chain
+# (e.g. the Firefox download HEADs) is its own interaction and requests follows them as usual.
+# Each interaction is one <hash>-<n>.gz file: a JSON metadata line followed by the raw body.
+
+# Sent by the on-disk cache; dropped so recordings always hold full 200 bodies and
+# replays do not depend on what the local cache happened to contain
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+class CassetteMiss(requests.ConnectionError):
+    """The request was not recorded in the cassette being replayed."""
+    # Replaying again would give the same answer
+    retryable = False
+
+def interaction_key(method, url):
+    return hashlib.sha256(f"{method} {url}".encode("utf-8")).hexdigest()[:32]
+
+def write_interaction(path, meta, body):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, "wb") as f:
+        f.write(json.dumps(meta).encode("utf-8") + b"\n")
+        f.write(body)
+    os.replace(tmp_path, path)
+
+def read_interaction(path):
+    with gzip.open(path, "rb") as f:
+        meta = json.loads(f.readline())
+        return meta, f.read()
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that records every response to, or replays it from, a cassette directory.
+    Repeated requests for the same method + URL are numbered in the order they are sent;
+    a replay that asks for more than were recorded gets the last recorded one.
+    """
+
+    def __init__(self, cassette_dir, mode, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette_dir = cassette_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._counts = {}
+        if mode == "record":
+            os.makedirs(cassette_dir, exist_ok=True)
+
+    def _path(self, key, n):
+        return os.path.join(self.cassette_dir, f"{key}-{n}.gz")
+
+    def _next_path(self, request):
+        key = interaction_key(request.method, request.url)
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+        if self.mode == "replay":
+            while n > 0 and not os.path.exists(self._path(key, n)):
+                n -= 1
+        return self._path(key, n)
+
+    def _build(self, request, meta, body):
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=meta["headers"],
+            status=meta["status"],
+            reason=meta["reason"],
+            preload_content=False,
+            decode_content=True,
+            request_method=request.method,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
+
+    def send(self, request, **kwargs):
+        for name in CONDITIONAL_HEADERS:
+            request.headers.pop(name, None)
+        path = self._next_path(request)
+        if self.mode == "replay":
+            try:
+                meta, body = read_interaction(path)
+            except OSError:
+                raise CassetteMiss(f"{request.method} {request.url} is not in cassette {self.cassette_dir}", request=request)
+            return self._build(request, meta, body)
+
+        response = super().send(request, **kwargs)
+        try:
+            body = response.raw.read(decode_content=False)
+        finally:
+            response.raw.release_conn()
+        meta = {
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": list(response.raw.headers.items()),
+        }
+        write_interaction(path, meta, body)
+        return self._build(request, meta, body)
+
+def adapter_from_env(**kwargs):
+    """Return a CassetteAdapter when BOFA_RECORD_DIR or BOFA_REPLAY_DIR is set, else None."""
+    if os.environ.get("BOFA_REPLAY_DIR"):
+        return CassetteAdapter(os.environ["BOFA_REPLAY_DIR"], "replay", **kwargs)
+    if os.environ.get("BOFA_RECORD_DIR"):
+        return CassetteAdapter(os.environ["BOFA_RECORD_DIR"], "record", **kwargs)
+    return None
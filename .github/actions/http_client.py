@@ -0,0 +1,134 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachedSession, request_fingerprint
+from http_cassette import adapter_from_env
+from request_coalescer import COALESCER
+from run_report import REPORT
+
+# Enough connections for every channel/endpoint of the busiest generator to be in flight at once
+MAX_WORKERS = 18
+
+_session = None
+_adapter = None
+_session_lock = threading.Lock()
+
+def _shared_adapter():
+    """Connection-pooling adapter shared by every session in the process. Caller holds _session_lock."""
+    global _adapter
+    if _adapter is None:
+        pool = {"pool_connections": MAX_WORKERS, "pool_maxsize": MAX_WORKERS}
+        _adapter = adapter_from_env(**pool) or HTTPAdapter(**pool)
+    return _adapter
+
+def record_response(response, *args, **kwargs):
+    """
+    Response hook adding every HTTP exchange (each redirect hop included) to the run report.
+    Non-streamed bodies are read here so the transfer time is part of the latency.
+    """
+    start = time.perf_counter()
+    if kwargs.get("stream"):
+        nbytes = int(response.headers.get("Content-Length", 0) or 0)
+    else:
+        nbytes = len(response.content)
+    seconds = response.elapsed.total_seconds() + (time.perf_counter() - start)
+    REPORT.record_request(urlsplit(response.url).hostname, seconds, nbytes, response.status_code)
+
+def new_session():
+    """
+    Return a new CachedSession (own headers/cookies) that draws connections from the shared pool.
+    """
+    session = CachedSession()
+    session.hooks["response"].append(record_response)
+    with _session_lock:
+        adapter = _shared_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_shared_session():
+    """
+    Return the process-wide requests.Session used by the generators.
+    The session keeps HTTPS connections alive so repeated requests to the same host reuse them,
+    and its GETs are revalidated against the on-disk HTTP cache.
+    """
+    global _session
+    if _session is None:
+        session = new_session()
+        with _session_lock:
+            if _session is None:
+                _session = session
+    return _session
+
+def fetch_text(url, session=None, headers=None):
+    """
+    GET a URL and return the response body as text ("" on any error, like `curl -s`).
+    Errors that retrying cannot fix, such as a response missing from a replayed cassette, are raised.
+    """
+    session = session or get_shared_session()
+    try:
+        response = session.get(url, headers=headers)
+        return response.text
+    except requests.RequestException as e:
+        if not getattr(e, "retryable", True):
+            raise
+        print(f"Error fetching {url}: {e}")
+        return ""
+
+def fetch_json(url, session=None):
+    """
+    GET a URL and return its parsed JSON body (an error status raises). Repeated calls in the
+    same run share one request and one parsed object, so callers must not mutate the result.
+    """
+    session = session or get_shared_session()
+    key = ("json",) + request_fingerprint(session, url)
+
+    def get_json():
+        response = session.get(url)
+        response.raise_for_status()
+        return response.json()
+    return COALESCER.run(key, get_json)
+
+def interleave_by_host(jobs):
+    """
+    Order {key: url} jobs round-robin across hosts, so the pool does not fill up with
+    requests queued behind one host's rate limit while other hosts sit idle.
+    """
+    by_host = {}
+    for key, url in jobs.items():
+        by_host.setdefault(urlsplit(url).hostname, []).append((key, url))
+    queues = list(by_host.values())
+    ordered = []
+    for i in range(max((len(queue) for queue in queues), default=0)):
+        ordered.extend(queue[i] for queue in queues if i < len(queue))
+    return ordered
+
+def fetch_many(jobs, on_result=None, session=None, max_workers=MAX_WORKERS, fetch=fetch_text):
+    """
+    Fetch several URLs at once.
+    jobs: dict of {key: url}. Requests are started round-robin across hosts and sent over the
+    shared connection pool as fast as each host's rate limit allows (see rate_limits.py).
+    on_result: optional callback(key, text) run as soon as each response arrives; its return
+    value is stored as the result for that key (the raw text is stored when no callback is given).
+    fetch: callable(url, session) for endpoints that need more than one GET; whatever it returns
+    (text, or an already parsed document) is what on_result receives.
+    Returns a dict of {key: result}.
+    """
+    session = session or get_shared_session()
+    results = {}
+    if not jobs:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        # Each fetch runs in a copy of the caller's context so it is reported under the caller's stage
+        futures = {pool.submit(contextvars.copy_context().run, fetch, url, session): key for key, url in interleave_by_host(jobs)}
+        for future in as_completed(futures):
+            key = futures[future]
+            text = future.result()
+            results[key] = on_result(key, text) if on_result else text
+    return results
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+
+from run_report import REPORT
+from stream_writers import matches_file, write_stream, write_text
+
+# Stable-output mode (BOFA_STABLE_OUTPUT=1; off by default, turned on by the scheduled workflow).
+# Normally every history file embeds the time of the run that wrote it, so each hourly run
+# rewrites (and commits) every byte of them. In stable mode a history file keeps the
+# last_updated of the run that last changed its data, and the time of every run is kept in a
+# small last_updated.json manifest in the output directory instead:
+#   {"last_run": <time of the latest run>,
+#    "files": {<file name>: {"last_updated": <time embedded in the file>, "checked": <time of the latest run that produced it>}}}
+# generate_readme reads run times from the manifest when there is one.
+
+STABLE_OUTPUT = os.environ.get("BOFA_STABLE_OUTPUT", "").lower() in ("1", "true", "yes")
+MANIFEST_NAME = "last_updated.json"
+
+_manifest_lock = threading.Lock()
+
+def manifest_path(directory):
+    return os.path.join(directory, MANIFEST_NAME)
+
+def load_manifest(directory):
+    try:
+        with open(manifest_path(directory), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+def _file_entry(path):
+    # A manifest left from an earlier stable-mode run says nothing about files written since
+    if not STABLE_OUTPUT:
+        return {}
+    return load_manifest(os.path.dirname(path)).get("files", {}).get(os.path.basename(path), {})
+
+def recorded_stamp(path):
+    """The last_updated text the manifest says path embeds, or None."""
+    return _file_entry(path).get("last_updated")
+
+def checked_stamp(path):
+    """Time of the latest run that produced path, or None when it is not in a manifest."""
+    return _file_entry(path).get("checked")
+
+def run_stamp(path):
+    """
+    In stable-output mode, the time of the latest run that produced path, falling back to the
+    latest run in its directory; None otherwise or when there is no manifest.
+    """
+    if not STABLE_OUTPUT:
+        return None
+    return checked_stamp(path) or load_manifest(os.path.dirname(path)).get("last_run")
+
+def record_output(path, stamp, checked):
+    """
+    Note in the directory's manifest that path embeds stamp and was produced by the run at checked.
+    Only done in stable-output mode, for files in an output directory.
+    """
+    directory = os.path.dirname(path)
+    if not STABLE_OUTPUT or not directory:
+        return
+    with _manifest_lock:
+        manifest = load_manifest(directory)
+        manifest["last_run"] = checked
+        manifest.setdefault("files", {})[os.path.basename(path)] = {"last_updated": stamp, "checked": checked}
+        write_text(manifest_path(directory), json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+def stable_stamp(path, last_updated, unchanged):
+    """
+    Stamp to embed in path when its data is known to be unchanged (or not): the stamp it
+    already has in stable-output mode, else this run's last_updated.
+    """
+    previous = recorded_stamp(path) if STABLE_OUTPUT and unchanged else None
+    return previous or last_updated
+
+def write_stable(path, render, last_updated):
+    """
+    Write render(stamp) to path, where stamp is the last_updated text the document embeds.
+    In stable-output mode a document that only differs from the file by its stamp is left as
+    it is, keeping the stamp it has. Returns the stamp now in the file.
+    """
+    previous = recorded_stamp(path) if STABLE_OUTPUT else None
+    if previous and previous != last_updated and matches_file(path, render(previous)):
+        REPORT.record_write(path, os.path.getsize(path), written=False)
+        stamp = previous
+    else:
+        write_stream(path, render(last_updated))
+        stamp = last_updated
+    record_output(path, stamp, last_updated)
+    return stamp
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Per-host politeness limits for every request sent through a CachedSession (see resilience.py).
+# host -> (requests per second, burst, max requests in flight)
+HOST_LIMITS = {
+    # Chrome
+    "versionhistory.googleapis.com": (20, 20, 8),
+    # Firefox
+    "product-details.mozilla.org": (10, 10, 6),
+    "download.mozilla.org": (5, 5, 4),
+    # Edge
+    "edgeupdates.microsoft.com": (5, 5, 4),
+    # Safari
+    "swscan.apple.com": (2, 2, 2),
+    "developer.apple.com": (2, 4, 2),
+}
+DEFAULT_LIMIT = (5, 5, 4)
+
+def parse_limits(spec):
+    """
+    Parse BOFA_HOST_LIMITS overrides: "host=rate/burst/in_flight;host=..."
+    e.g. "developer.apple.com=1/2/1".
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(";"))):
+        host, _, values = item.partition("=")
+        rate, burst, in_flight = values.split("/")
+        limits[host.strip()] = (float(rate), float(burst), int(in_flight))
+    return limits
+
+HOST_LIMITS.update(parse_limits(os.environ.get("BOFA_HOST_LIMITS", "")))
+
+class HostLimiter:
+    """
+    Token bucket plus in-flight cap for one host. Waiters are served first come, first served,
+    so one busy caller cannot starve the others.
+    """
+
+    def __init__(self, host, rate, burst, max_in_flight):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.tokens = burst
+        self.in_flight = 0
+        self._updated = time.monotonic()
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """
+        Wait for a free in-flight slot and a token. Returns the seconds spent waiting;
+        raises TimeoutError if that would take longer than timeout.
+        """
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    self._refill()
+                    first = self._queue[0] is ticket
+                    if first and self.in_flight < self.max_in_flight and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return time.monotonic() - start
+                    # Blocked only on tokens: sleep until the next one; otherwise wait to be notified
+                    wait = (1 - self.tokens) / self.rate if first and self.in_flight < self.max_in_flight else None
+                    if timeout is not None:
+                        left = timeout - (time.monotonic() - start)
+                        if left <= 0:
+                            raise TimeoutError(f"waited {timeout:.1f}s for a request slot on {self.host}")
+                        wait = left if wait is None else min(wait, left)
+                    self._cond.wait(wait)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold back every caller for this host, e.g. after a 429."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def limiter_for(host):
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = HostLimiter(host, *HOST_LIMITS.get(host, DEFAULT_LIMIT))
+        return _limiters[host]
@@ -0,0 +1,55 @@
+import threading
+
+class RequestCoalescer:
+    """
+    Per-process single-flight + memo for fetches.
+    The first caller for a key runs the fetch; concurrent callers for the same key wait for it,
+    and later callers get the memoized result. Failed fetches are not memoized.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+        self._in_flight = {}
+        self.stats = {"requests": 0, "fetched": 0, "saved": 0}
+
+    def run(self, key, fetch, memo_if=None):
+        """
+        Return the result for key, calling fetch() only if no result is memoized or in flight.
+        memo_if: optional predicate deciding whether a successful result may be reused.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+        while True:
+            with self._lock:
+                if key in self._results:
+                    self.stats["saved"] += 1
+                    return self._results[key]
+                event = self._in_flight.get(key)
+                leader = event is None
+                if leader:
+                    event = threading.Event()
+                    self._in_flight[key] = event
+            if leader:
+                break
+            # Wait for the in-flight fetch; if it failed or was not reusable, try again ourselves
+            event.wait()
+        try:
+            result = fetch()
+            with self._lock:
+                self.stats["fetched"] += 1
+                if memo_if is None or memo_if(result):
+                    self._results[key] = result
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            event.set()
+
+    def report(self):
+        """One-line summary of how many requests were served without a new fetch."""
+        s = self.stats
+        return f"Request coalescing: {s['requests']} requests, {s['fetched']} fetched, {s['saved']} saved"
+
+# Shared by every session and helper in the process
+COALESCER = RequestCoalescer()
@@ -0,0 +1,163 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from rate_limits import limiter_for
+from run_report import REPORT
+
+# Timeouts, retries, circuit breaking and per-host rate limiting (rate_limits.py) for every
+# request sent through a CachedSession.
+# run_pipeline.py gives each stage a Deadline; requests made after it has passed fail
+# immediately with DeadlineExceeded, and request timeouts never extend past it.
+
+# (connect, read) seconds for a single attempt
+REQUEST_TIMEOUT = (10, 30)
+MAX_ATTEMPTS = int(os.environ.get("BOFA_MAX_ATTEMPTS", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+
+class DeadlineExceeded(requests.Timeout):
+    """The stage's time budget ran out; no further requests are sent."""
+
+class CircuitOpen(requests.ConnectionError):
+    """The host failed repeatedly and is not contacted until its cool-down ends."""
+
+class Deadline:
+    """Absolute point in time (time.time()) after which a stage's requests fail fast."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.time() + seconds
+        self.expired = False
+
+    def remaining(self):
+        return self.expires_at - time.time()
+
+    def check(self, what):
+        if self.remaining() <= 0:
+            self.expired = True
+            raise DeadlineExceeded(f"deadline exceeded before {what}")
+
+# Deadline of the stage the current code runs for (None outside run_pipeline.py)
+CURRENT_DEADLINE = contextvars.ContextVar("bofa_deadline", default=None)
+
+class CircuitBreaker:
+    """
+    Opens after BREAKER_THRESHOLD consecutive failures and rejects requests for BREAKER_COOLDOWN
+    seconds; after that requests are let through again and the first success closes it.
+    """
+
+    def __init__(self, host, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is not None and time.time() - self.opened_at < self.cooldown:
+                raise CircuitOpen(f"circuit open for {self.host} after {self.failures} consecutive failures")
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.time()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker_for(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+def clamp_timeout(timeout, deadline):
+    if deadline is None:
+        return timeout
+    remaining = max(deadline.remaining(), 0.001)
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) for t in timeout)
+    return min(timeout, remaining)
+
+def backoff_delay(attempt, response=None):
+    """Full-jitter exponential backoff; a numeric Retry-After from the server wins (capped)."""
+    retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+    if retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def request_with_retries(send, method, url, **kwargs):
+    """
+    Call send(method, url, **kwargs) with a timeout clamped to the current deadline, once the
+    host's rate limiter grants a slot (time spent waiting is reported as "throttle_wait").
+    Connection errors, timeouts and 429/5xx responses are retried with jittered exponential
+    backoff, as long as the deadline leaves room for the wait (errors with retryable = False,
+    such as cassette misses, are raised at once). The last response is returned
+    (or the last error raised) when the attempts run out.
+    """
+    breaker = breaker_for(urlsplit(url).netloc)
+    limiter = limiter_for(urlsplit(url).hostname)
+    deadline = CURRENT_DEADLINE.get()
+    timeout = kwargs.pop("timeout", None) or REQUEST_TIMEOUT
+    error = None
+    response = None
+    for attempt in range(MAX_ATTEMPTS):
+        if deadline is not None:
+            deadline.check(f"{method} {url}")
+        breaker.before_request()
+        try:
+            waited = limiter.acquire(timeout=deadline.remaining() if deadline is not None else None)
+        except TimeoutError as e:
+            if deadline is None:
+                raise
+            deadline.expired = True
+            raise DeadlineExceeded(f"deadline exceeded waiting to send {method} {url}") from e
+        REPORT.add_span("throttle_wait", waited)
+        try:
+            response = send(method, url, timeout=clamp_timeout(timeout, deadline), **kwargs)
+            error = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not getattr(e, "retryable", True):
+                raise
+            breaker.record(False)
+            if deadline is not None and deadline.remaining() <= 0:
+                deadline.expired = True
+                raise DeadlineExceeded(f"deadline exceeded during {method} {url}") from e
+            error, response = e, None
+        finally:
+            limiter.release()
+        if error is None:
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record(True)
+                return response
+            breaker.record(False)
+        if attempt == MAX_ATTEMPTS - 1:
+            break
+        delay = backoff_delay(attempt, response)
+        if response is not None and response.status_code == 429:
+            # Slow down every caller for this host, not just this retry
+            limiter.pause(delay)
+        if deadline is not None and delay >= deadline.remaining():
+            break
+        if response is not None:
+            response.close()
+        time.sleep(delay)
+    if error is not None:
+        raise error
+    return response
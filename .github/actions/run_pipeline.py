@@ -0,0 +1,238 @@
+"""
+Run every generator in one process.
+
+The four vendor generators are independent, so they run concurrently and share one HTTP
+connection pool; the RSS feed and README start as soon as the files they read are written.
+Each stage has a time budget, capped by the pipeline's overall deadline. Once it runs out, the
+stage's remaining requests fail fast (see resilience.py). A vendor stage that fails or runs out of
+time gets its previous output files restored, so the last good data is carried forward. A single
+endpoint that fails or is too slow is served from its last good payload instead (see fallback_store.py).
+A per-stage timing table is printed at the end and everything the stages recorded
+(see run_report.py) is written to run_report.json.
+
+Usage:
+    python .github/actions/run_pipeline.py [--processes] [--record DIR | --replay DIR]
+        [--deadline SECONDS] [--stage-deadline STAGE=SECONDS ...]
+
+--processes runs each stage in a worker process instead of a thread (separate connection pools,
+but serialization work is not limited by the GIL).
+--record DIR saves every HTTP response into a cassette directory; --replay DIR runs the whole
+pipeline offline from one (see http_cassette.py).
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from build_graph import file_digest, run_step
+from http_cache import CACHE_STATS, count
+from request_coalescer import COALESCER
+from resilience import CURRENT_DEADLINE, Deadline
+from run_report import CURRENT_STAGE, REPORT
+
+# stage name -> (module, entry point, stages whose output files it reads, output directories it owns)
+STAGES = {
+    "safari": ("generate_safari_latest", "main", [], ["latest_safari_files"]),
+    "firefox": ("generate_firefox_latest", "main", [], ["latest_firefox_files"]),
+    "edge": ("generate_edge_latest", "main", [], ["latest_edge_files"]),
+    "chrome": ("generate_chrome_latest", "main", [], ["latest_chrome_files"]),
+    "rss": ("generate_rss_feed", "main", ["chrome", "edge", "firefox"], []),
+    "readme": ("generate_readme", "generate_readme", ["safari", "firefox", "edge", "chrome"], []),
+}
+
+# Files the downstream stages read and write. In stable-output mode (see build_graph) a stage
+# whose input files are byte-identical to its last run, and whose outputs are untouched, is skipped.
+STAGE_FILES = {
+    "rss": (
+        ["latest_chrome_files/chrome_latest_versions.xml", "latest_edge_files/edge_latest_versions.xml",
+         "latest_firefox_files/firefox_latest_versions.xml"],
+        ["latest_chrome_files/chrome_rss.xml", "latest_edge_files/edge_rss.xml", "latest_firefox_files/firefox_rss.xml"],
+    ),
+    "readme": (
+        [f"latest_{vendor}_files/{vendor}_latest_versions.xml" for vendor in ("chrome", "firefox", "edge", "safari")],
+        ["README.md"],
+    ),
+}
+
+# Seconds each stage may spend before its remaining requests fail fast
+STAGE_DEADLINES = {"safari": 300, "firefox": 180, "edge": 120, "chrome": 300, "rss": 60, "readme": 60}
+# Budget for the whole run; later stages get whatever is left of it
+PIPELINE_DEADLINE = 900
+
+def snapshot_outputs(dirs):
+    """Copy the stage's existing output directories aside; returns the snapshot directory or None."""
+    existing = [d for d in dirs if os.path.isdir(d)]
+    if not existing:
+        return None
+    snapshot = tempfile.mkdtemp(prefix="bofa-last-good-")
+    for d in existing:
+        shutil.copytree(d, os.path.join(snapshot, d))
+    return snapshot
+
+def restore_outputs(snapshot, dirs):
+    for d in dirs:
+        saved = os.path.join(snapshot, d)
+        if os.path.isdir(saved):
+            shutil.rmtree(d, ignore_errors=True)
+            shutil.copytree(saved, d)
+
+def run_stage(name, budget=None, not_after=None):
+    """
+    Import a stage's module and call its entry point within its deadline.
+    budget: seconds for this stage (default STAGE_DEADLINES); not_after: time.time() by which the
+    whole pipeline must be done. Returns {start, end, error, timed_out, carried_forward}; in a worker
+    process the result also carries that process's run report and cache/coalescing counters.
+    """
+    module_name, entry, _, outputs = STAGES[name]
+    CURRENT_STAGE.set(name)
+    budget = STAGE_DEADLINES[name] if budget is None else budget
+    if not_after is not None:
+        budget = min(budget, not_after - time.time())
+    start = time.time()
+    result = {"start": start, "error": None, "timed_out": False, "carried_forward": False}
+    if budget <= 0:
+        # Nothing has been touched, so the previous outputs stay as they are
+        result.update(error="skipped: pipeline deadline exceeded", timed_out=True, carried_forward=True)
+    else:
+        deadline = Deadline(budget)
+        CURRENT_DEADLINE.set(deadline)
+        snapshot = snapshot_outputs(outputs)
+        try:
+            try:
+                module = importlib.import_module(module_name)
+                if name in STAGE_FILES:
+                    reads, writes = STAGE_FILES[name]
+                    run_step(name, {path: file_digest(path) for path in reads}, writes, getattr(module, entry))
+                else:
+                    getattr(module, entry)()
+            except Exception:
+                traceback.print_exc()
+                result["error"] = traceback.format_exc(limit=1).strip().splitlines()[-1]
+            result["timed_out"] = deadline.expired
+            if snapshot and (result["error"] or result["timed_out"]):
+                restore_outputs(snapshot, outputs)
+                result["carried_forward"] = True
+                print(f"{name}: restored last good outputs")
+        finally:
+            if snapshot:
+                shutil.rmtree(snapshot, ignore_errors=True)
+    result["end"] = time.time()
+    if multiprocessing.parent_process() is not None:
+        result["report"] = REPORT.to_dict()
+        result["cache"] = dict(CACHE_STATS)
+        result["coalescing"] = dict(COALESCER.stats)
+    return result
+
+def run_pipeline(executor, deadlines=None, not_after=None):
+    """
+    Submit each stage once all of its dependencies have finished and wait for everything.
+    A failed vendor stage does not block README/RSS: its last good output files are on disk.
+    deadlines: optional {stage: seconds} overriding STAGE_DEADLINES.
+    Returns {stage: result} in completion order.
+    """
+    deadlines = {**STAGE_DEADLINES, **(deadlines or {})}
+    pending = dict(STAGES)
+    running = {}
+    results = {}
+    while pending or running:
+        for name, (_, _, deps, _) in list(pending.items()):
+            if all(dep in results for dep in deps):
+                running[executor.submit(run_stage, name, deadlines[name], not_after)] = name
+                del pending[name]
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            results[name] = future.result()
+            if "report" in results[name]:
+                merge_worker_stats(results[name])
+    return results
+
+def merge_worker_stats(result):
+    REPORT.merge(result.pop("report"))
+    for key, value in result.pop("cache").items():
+        count(key, value)
+    for key, value in result.pop("coalescing").items():
+        COALESCER.stats[key] += value
+
+def print_timing_table(results, pipeline_start, pipeline_end):
+    print()
+    print(f"{'Stage':<10} {'Start':>8} {'Duration':>9}  Status")
+    for name, result in sorted(results.items(), key=lambda item: item[1]["start"]):
+        status = "ok" if result["error"] is None else f"FAILED: {result['error']}"
+        if result["timed_out"]:
+            status = "TIMED OUT" if result["error"] is None else f"TIMED OUT ({result['error']})"
+        if result["carried_forward"]:
+            status += "; kept last good outputs"
+        if REPORT.stale.get(name):
+            status += f"; {len(REPORT.stale[name])} stale payload(s)"
+        print(f"{name:<10} {result['start'] - pipeline_start:7.2f}s {result['end'] - result['start']:8.2f}s  {status}")
+    total = sum(result["end"] - result["start"] for result in results.values())
+    print(f"Total wall time: {pipeline_end - pipeline_start:.2f}s (sum of stages: {total:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all BOFA generators, then the RSS feed and README.")
+    parser.add_argument("--processes", action="store_true", help="run stages in worker processes instead of threads")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="DIR", help="record all HTTP responses into a cassette directory")
+    cassette.add_argument("--replay", metavar="DIR", help="serve all HTTP responses from a recorded cassette directory")
+    parser.add_argument("--deadline", type=float, default=PIPELINE_DEADLINE, help=f"seconds for the whole run (default {PIPELINE_DEADLINE})")
+    parser.add_argument("--stage-deadline", action="append", default=[], metavar="STAGE=SECONDS", help="override one stage's budget; may be repeated")
+    args = parser.parse_args()
+
+    deadlines = {}
+    for item in args.stage_deadline:
+        name, _, seconds = item.partition("=")
+        if name not in STAGES or not seconds:
+            parser.error(f"invalid --stage-deadline {item!r}; expected STAGE=SECONDS with STAGE one of {', '.join(STAGES)}")
+        deadlines[name] = float(seconds)
+
+    # Set in the environment so stages in worker processes pick it up too
+    if args.record:
+        os.environ["BOFA_RECORD_DIR"] = os.path.abspath(args.record)
+        print(f"Recording HTTP responses to {args.record}")
+    if args.replay:
+        if not os.path.isdir(args.replay):
+            parser.error(f"cassette directory {args.replay} does not exist")
+        os.environ["BOFA_REPLAY_DIR"] = os.path.abspath(args.replay)
+        print(f"Replaying HTTP responses from {args.replay}")
+
+    executor_class = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    pipeline_start = time.time()
+    with executor_class(max_workers=len(STAGES)) as executor:
+        results = run_pipeline(executor, deadlines, not_after=pipeline_start + args.deadline)
+    pipeline_end = time.time()
+    print_timing_table(results, pipeline_start, pipeline_end)
+    stages = {
+        name: {
+            "start_s": round(result["start"] - pipeline_start, 3),
+            "wall_s": round(result["end"] - result["start"], 3),
+            "error": result["error"],
+            "timed_out": result["timed_out"],
+            "carried_forward": result["carried_forward"],
+            "stale": bool(REPORT.stale.get(name)),
+        }
+        for name, result in results.items()
+    }
+    writes = REPORT.writes
+    print(f"Outputs: {writes['files_written']} written ({writes['bytes_written']} bytes), "
+          f"{writes['files_skipped']} unchanged ({writes['bytes_skipped']} bytes skipped)")
+    steps = [outcome for stage_steps in REPORT.steps.values() for outcome in stage_steps.values()]
+    print(f"Build steps: {steps.count('built')} built, {steps.count('skipped')} skipped")
+    stale = [url for stage_stale in REPORT.stale.values() for url in stage_stale]
+    if stale:
+        print(f"Stale payloads: {len(stale)} served from the last good store (revalidated next run)")
+    REPORT.write(wall_s=round(pipeline_end - pipeline_start, 3), stages=stages, cache=CACHE_STATS, coalescing=COALESCER.stats)
+    # A vendor stage whose last good outputs were kept has degraded gracefully; anything else fails the run
+    if any(result["error"] and not result["carried_forward"] for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Lightweight run instrumentation shared by all scripts.
+# span() times a block; spans are summed per stage and name, and spans given a `path` are also
+# added to that output file's entry (with the file's size once it exists).
+# HTTP exchanges are recorded by a session response hook in http_client.
+# stream_writers.write_stream() records the bytes each output write wrote or skipped as unchanged,
+# and build_graph.run_step() whether each build step ran or was skipped.
+# Payloads served from the last-known-good store instead of a live response are listed under "stale".
+# write() saves everything as run_report.json (run_pipeline.py does this once per run).
+
+REPORT_PATH = os.environ.get("BOFA_RUN_REPORT", "run_report.json")
+
+# Stage the current code runs for; set by run_pipeline.run_stage and copied into fetch threads
+CURRENT_STAGE = contextvars.ContextVar("bofa_stage", default=None)
+
+class RunReport:
+    """Collects span timings, per-host request stats and output file sizes for one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+        self.spans = {}
+        self.requests = {}
+        self.files = {}
+        self.writes = {"files_written": 0, "files_skipped": 0, "bytes_written": 0, "bytes_skipped": 0}
+        self.steps = {}
+        self.stale = {}
+
+    @contextmanager
+    def span(self, name, path=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start, path)
+
+    def add_span(self, name, seconds, path=None):
+        stage = CURRENT_STAGE.get() or "main"
+        with self._lock:
+            totals = self.spans.setdefault(stage, {}).setdefault(name, {"count": 0, "seconds": 0.0})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            if path:
+                entry = self.files.setdefault(os.path.relpath(path), {"stage": stage})
+                entry[f"{name}_s"] = entry.get(f"{name}_s", 0.0) + seconds
+                if os.path.exists(path):
+                    entry["bytes"] = os.path.getsize(path)
+
+    def record_request(self, host, seconds, nbytes, status):
+        with self._lock:
+            stats = self.requests.setdefault(host, {"count": 0, "seconds": 0.0, "max_s": 0.0, "bytes": 0, "not_modified": 0, "errors": 0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+            stats["bytes"] += nbytes
+            if status == 304:
+                stats["not_modified"] += 1
+            elif status >= 400:
+                stats["errors"] += 1
+
+    def record_write(self, path, nbytes, written):
+        """Count an output write; written=False when the file already held these nbytes."""
+        with self._lock:
+            entry = self.files.setdefault(os.path.relpath(path), {"stage": CURRENT_STAGE.get() or "main"})
+            entry["written"] = written
+            outcome = "written" if written else "skipped"
+            self.writes[f"files_{outcome}"] += 1
+            self.writes[f"bytes_{outcome}"] += nbytes
+
+    def record_step(self, name, built):
+        """Note whether a build_graph step ran or was skipped as up to date."""
+        with self._lock:
+            self.steps.setdefault(CURRENT_STAGE.get() or "main", {})[name] = "built" if built else "skipped"
+
+    def record_stale(self, url, reason, age_s=None):
+        """Note that url was served from fallback_store's last good payload (age_s seconds old) because of reason."""
+        with self._lock:
+            self.stale.setdefault(CURRENT_STAGE.get() or "main", {})[url] = {
+                "reason": reason, "age_s": None if age_s is None else round(age_s, 1)}
+
+    def to_dict(self):
+        with self._lock:
+            return json.loads(json.dumps({"spans": self.spans, "requests": self.requests, "files": self.files,
+                                          "writes": self.writes, "steps": self.steps, "stale": self.stale}))
+
+    def merge(self, data):
+        """Add a to_dict() snapshot from another process (run_pipeline --processes)."""
+        with self._lock:
+            for stage, names in data["spans"].items():
+                for name, totals in names.items():
+                    mine = self.spans.setdefault(stage, {}).setdefault(name, {"count": 0, "seconds": 0.0})
+                    mine["count"] += totals["count"]
+                    mine["seconds"] += totals["seconds"]
+            for host, stats in data["requests"].items():
+                mine = self.requests.setdefault(host, {key: 0 for key in stats})
+                for key, value in stats.items():
+                    mine[key] = max(mine[key], value) if key == "max_s" else mine[key] + value
+            self.files.update(data["files"])
+            for key, value in data.get("writes", {}).items():
+                self.writes[key] = self.writes.get(key, 0) + value
+            for stage, steps in data.get("steps", {}).items():
+                self.steps.setdefault(stage, {}).update(steps)
+            for stage, urls in data.get("stale", {}).items():
+                self.stale.setdefault(stage, {}).update(urls)
+
+    def write(self, path=REPORT_PATH, **extra):
+        """Write run_report.json; extra keys (stage timings, cache stats, ...) are added at the top level."""
+        report = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+        }
+        report.update(extra)
+        report.update(self.to_dict())
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Run report written to {path}")
+
+# Shared by every script in the process
+REPORT = RunReport()
+span = REPORT.span
@@ -0,0 +1,83 @@
+import json
+import os
+import re
+
+import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON/YAML serialization shared by the generators.
+# dump_json and dump_yaml return exactly what json.dumps and yaml.dump would, but use orjson
+# and the libyaml emitter (CDumper/CSafeDumper) when they are installed and the data is known
+# to come out byte-identical. Both differ from the stdlib/pure-Python output on some input
+# (non-ASCII and control characters, floats, NaN); such data takes the pure-Python path.
+# BOFA_PURE_SERIALIZERS=1 turns the accelerated backends off.
+# verify_serializers.py checks that both paths agree; bench_serializers.py times them.
+
+ACCELERATED = os.environ.get("BOFA_PURE_SERIALIZERS", "").lower() not in ("1", "true", "yes")
+
+# Pure-Python Dumper -> libyaml Dumper with the same representer
+YAML_DUMPERS = {
+    yaml.Dumper: getattr(yaml, "CDumper", None),
+    yaml.SafeDumper: getattr(yaml, "CSafeDumper", None),
+}
+
+# In json.dumps output (ASCII-only), any backslash escape other than \" and \\ means a string holds
+# a control, DEL or non-ASCII character, which libyaml and PyYAML quote differently
+_YAML_UNSAFE = re.compile(r'\\[^"\\]')
+# orjson formats some floats differently (1e+16 vs 10000000000000000.0, 1e-05 vs 1e-5), so its
+# output is only used when it holds no float at all. In indented output a number is either a
+# value after ": " or a list item at the start of a line (or the whole document); a float has
+# a "." or an exponent.
+_ORJSON_FLOAT_VALUE = re.compile(rb": -?[0-9]+[.eE]")
+_ORJSON_FLOAT_ITEM = re.compile(rb"\n *-?[0-9]+[.eE]")
+_ORJSON_FLOAT = re.compile(rb"-?[0-9]+[.eE]")
+
+def _use_accelerated(accelerated):
+    return ACCELERATED if accelerated is None else accelerated
+
+def libyaml_safe(data):
+    """True when the libyaml emitter is known to write data exactly like PyYAML's."""
+    try:
+        return not _YAML_UNSAFE.search(json.dumps(data))
+    except (TypeError, ValueError):
+        return False
+
+def dump_yaml(data, stream=None, Dumper=yaml.Dumper, accelerated=None, **options):
+    """
+    yaml.dump(data, stream, Dumper=Dumper, **options), emitted by libyaml when that gives the same text.
+    """
+    fast_dumper = YAML_DUMPERS.get(Dumper)
+    if _use_accelerated(accelerated) and fast_dumper is not None and libyaml_safe(data):
+        Dumper = fast_dumper
+    return yaml.dump(data, stream, Dumper=Dumper, **options)
+
+def _has_nan(data):
+    try:
+        json.dumps(data, allow_nan=False)
+    except ValueError:
+        return True
+    return False
+
+def dump_json(data, indent=2, accelerated=None, **options):
+    """
+    json.dumps(data, indent=indent, **options), encoded by orjson when that gives the same text.
+    """
+    if _use_accelerated(accelerated) and orjson is not None and indent == 2 and not options:
+        try:
+            # Types the json module cannot encode must fail the same way
+            text = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:
+            text = None
+        if (text is not None
+                # json escapes non-ASCII characters and DEL, orjson does not
+                and text.isascii() and b"\x7f" not in text
+                and not _ORJSON_FLOAT.match(text)
+                and not _ORJSON_FLOAT_VALUE.search(text) and not _ORJSON_FLOAT_ITEM.search(text)
+                # orjson writes NaN and infinities as null
+                and (b"null" not in text or not _has_nan(data))):
+            return text.decode()
+    return json.dumps(data, indent=indent, **options)
@@ -0,0 +1,182 @@
+import itertools
+import json
+import locale
+import os
+
+from run_report import REPORT
+from serializers import dump_json, dump_yaml
+
+# Record-by-record writers for the history files, which grow with every release.
+# Each iter_* generator yields the same text as dumping the whole {**header, key: records}
+# document at once, but serializes BATCH_SIZE records at a time, so neither the document
+# string nor a copy of the records has to be held in memory. write_stream() writes the pieces
+# to a file as they are produced. XML documents are streamed by xml_writer.iter_pretty_xml.
+# patch_stream() rewrites only the newest records of an existing file and copies the rest.
+# Every output file goes through write_stream() (or write_text()): a file that would come out
+# identical is left alone, and a changed one is written to a temporary file and moved into
+# place, so a crash or an overlapping run never leaves a half-written output behind.
+# Batches go through serializers.dump_json / dump_yaml, so accelerated backends are used when installed.
+
+BATCH_SIZE = 200
+
+def batched(records, size=BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_json_document(header, key, records, batch_size=BATCH_SIZE):
+    """
+    Yield json.dumps({**header, key: list(records)}, indent=2) piece by piece.
+    """
+    yield "{"
+    for name, value in header.items():
+        yield f"\n  {json.dumps(name)}: " + dump_json(value).replace("\n", "\n  ") + ","
+    yield f"\n  {json.dumps(key)}: ["
+    first = True
+    for batch in batched(records, batch_size):
+        # Strip the list's own "[\n" and "\n]"; its items are already indented by two spaces
+        text = dump_json(batch)[2:-2]
+        yield ("\n  " if first else ",\n  ") + text.replace("\n", "\n  ")
+        first = False
+    yield "]\n}" if first else "\n  ]\n}"
+
+def iter_yaml_document(header, key, records, batch_size=BATCH_SIZE, **options):
+    """
+    Yield yaml.dump({**header, key: list(records)}, sort_keys=False, **options) piece by piece.
+    key must be a plain (unquoted) YAML scalar, and records must not share lists or dicts
+    (yaml.dump would tie those together with anchors).
+    """
+    options["sort_keys"] = False
+    if header:
+        yield dump_yaml(header, **options)
+    first = True
+    for batch in batched(records, batch_size):
+        if first:
+            yield f"{key}:\n"
+            first = False
+        # A top-level block sequence is laid out exactly like one nested under a mapping key
+        yield dump_yaml(batch, **options)
+    if first:
+        yield f"{key}: []\n"
+
+COPY_BLOCK = 1024 * 1024
+
+def _copy_bytes(source, target, count):
+    while count > 0:
+        block = source.read(min(count, COPY_BLOCK))
+        if not block:
+            break
+        target.write(block)
+        count -= len(block)
+
+def write_stream(path, chunks, encoding=None):
+    """
+    Write the text (or bytes) pieces to path, unless the file already holds exactly that.
+    The pieces are compared with the existing file as they are produced; from the first
+    difference on, the file is rebuilt in a temporary file that replaces it with os.replace.
+    encoding defaults to the one open(path, "w") would use. Returns True if path was written.
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    try:
+        existing = open(path, "rb")
+    except OSError:
+        existing = None
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    matched = 0
+    target = None
+    try:
+        for chunk in chunks:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode(encoding)
+            if target is None:
+                if existing is not None and existing.read(len(data)) == data:
+                    matched += len(data)
+                    continue
+                target = open(tmp_path, "wb")
+                if matched:
+                    # Start the new file with the part that was unchanged
+                    existing.seek(0)
+                    _copy_bytes(existing, target, matched)
+            target.write(data)
+        if target is None:
+            if existing is not None and not existing.read(1):
+                REPORT.record_write(path, matched, written=False)
+                return False
+            # The file is missing, or the new text is a prefix of it
+            target = open(tmp_path, "wb")
+            if matched:
+                existing.seek(0)
+                _copy_bytes(existing, target, matched)
+        size = target.tell()
+        target.close()
+        target = None
+        os.replace(tmp_path, path)
+    finally:
+        if existing is not None:
+            existing.close()
+        if target is not None:
+            target.close()
+            os.remove(tmp_path)
+    REPORT.record_write(path, size, written=True)
+    return True
+
+def matches_file(path, chunks, encoding=None):
+    """
+    True if the file at path holds exactly the text (or bytes) pieces; stops reading at the first difference.
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    try:
+        existing = open(path, "rb")
+    except OSError:
+        return False
+    with existing:
+        for chunk in chunks:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode(encoding)
+            if existing.read(len(data)) != data:
+                return False
+        return not existing.read(1)
+
+def write_text(path, text, encoding=None):
+    """
+    Write a whole document to path through write_stream (skipped if unchanged).
+    """
+    return write_stream(path, [text], encoding)
+
+def iter_file_blocks(f, size=COPY_BLOCK):
+    while True:
+        block = f.read(size)
+        if not block:
+            return
+        yield block
+
+def patch_stream(path, head_chunks, old_head_chunks, footer, encoding=None):
+    """
+    Replace the first records of the document at path without serializing the others.
+    head_chunks and old_head_chunks are whole documents (as yielded by the iter_* generators,
+    each with at least one record) holding the new first records and the ones they replace;
+    footer is the text such a document ends with after its last record. The file becomes the
+    new head followed by the old file's bytes after the old head, copied as they are.
+    encoding is the one the file was written with (default as for write_stream).
+    Returns False, leaving the file untouched, if it does not start with the old head.
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    old_head = "".join(old_head_chunks).encode(encoding)
+    head = "".join(head_chunks).encode(encoding)
+    footer = footer.encode(encoding)
+    if not old_head.endswith(footer) or not head.endswith(footer):
+        return False
+    old_head = old_head[:len(old_head) - len(footer)]
+    head = head[:len(head) - len(footer)]
+    try:
+        source = open(path, "rb")
+    except OSError:
+        return False
+    with source:
+        if source.read(len(old_head)) != old_head:
+            return False
+        write_stream(path, itertools.chain([head], iter_file_blocks(source)), encoding)
+    return True
@@ -0,0 +1,109 @@
+"""
+Check that a vendor stage whose fetches all fail keeps its existing output files.
+
+Usage:
+    python .github/actions/verify_degraded_stages.py [stage ...]
+
+Each vendor stage (by default all four) runs on its own in a temporary copy of the scripts,
+README.md and latest_*_files directories, replaying an empty cassette so that every request it
+sends fails. The stage must report an error with its last good outputs kept, and every file in
+its output directories must be byte-identical to before. Exits with status 1 otherwise.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+sys.path.insert(0, SCRIPT_DIR)
+
+from run_pipeline import STAGES
+
+VENDOR_STAGES = [name for name, (_, _, deps, outputs) in STAGES.items() if outputs and not deps]
+
+def prepare_tree(root):
+    shutil.copytree(SCRIPT_DIR, os.path.join(root, ".github", "actions"), ignore=shutil.ignore_patterns("__pycache__"))
+    for name in os.listdir(REPO_ROOT):
+        path = os.path.join(REPO_ROOT, name)
+        if name.startswith("latest_") and os.path.isdir(path):
+            shutil.copytree(path, os.path.join(root, name))
+    if os.path.exists(os.path.join(REPO_ROOT, "README.md")):
+        shutil.copy2(os.path.join(REPO_ROOT, "README.md"), os.path.join(root, "README.md"))
+
+def snapshot(root, dirs):
+    """{relative path: sha256} of every file in the given output directories."""
+    digests = {}
+    for directory in dirs:
+        for dirpath, _, filenames in os.walk(os.path.join(root, directory)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, "rb") as f:
+                    digests[os.path.relpath(path, root)] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+def worker(stage, result_path):
+    """Run one stage in this process and write its result."""
+    from run_pipeline import run_stage
+    result = run_stage(stage)
+    with open(result_path, "w") as f:
+        json.dump({"error": result["error"], "carried_forward": result["carried_forward"]}, f)
+
+def check_stage(stage, verbose=False):
+    """Run stage with every request failing; returns a list of problems (empty if it passed)."""
+    outputs = STAGES[stage][3]
+    with tempfile.TemporaryDirectory(prefix="bofa-degraded-") as root:
+        prepare_tree(root)
+        cassette = os.path.join(root, "empty_cassette")
+        os.makedirs(cassette)
+        before = snapshot(root, outputs)
+        if not before:
+            return [f"no existing files in {', '.join(outputs)} to keep"]
+        result_path = os.path.join(root, ".result.json")
+        env = dict(os.environ, BOFA_REPLAY_DIR=cassette)
+        for name in ("BOFA_RECORD_DIR", "BOFA_STABLE_OUTPUT"):
+            env.pop(name, None)
+        script = os.path.join(root, ".github", "actions", os.path.basename(__file__))
+        output = None if verbose else subprocess.DEVNULL
+        subprocess.run([sys.executable, script, "--worker", stage, result_path], cwd=root, env=env, stdout=output, stderr=output)
+        if not os.path.exists(result_path):
+            return ["worker did not finish"]
+        with open(result_path, "r") as f:
+            result = json.load(f)
+        problems = []
+        if not result["error"]:
+            problems.append("stage reported success although every request failed")
+        if not result["carried_forward"]:
+            problems.append("last good outputs were not kept")
+        after = snapshot(root, outputs)
+        for path in sorted(set(before) | set(after)):
+            if before.get(path) != after.get(path):
+                problems.append(f"{path} {'removed' if path not in after else 'added' if path not in before else 'changed'}")
+        return problems
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], sys.argv[3])
+        return
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("stages", nargs="*", metavar="stage", help=f"one of {', '.join(VENDOR_STAGES)} (default: all)")
+    parser.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    args = parser.parse_args()
+    unknown = [stage for stage in args.stages if stage not in VENDOR_STAGES]
+    if unknown:
+        parser.error(f"unknown stage: {', '.join(unknown)}")
+    failed = False
+    for stage in args.stages or VENDOR_STAGES:
+        problems = check_stage(stage, args.verbose)
+        print(f"{stage}: {'kept its last good outputs' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"  {problem}")
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Check that incrementally updated Firefox history files are byte-identical to a full rebuild.
+
+Usage:
+    python .github/actions/verify_firefox_history.py
+
+A synthetic release list is written with generate_firefox_latest.update_history_files, then
+updated in place (new releases, a changed existing release, a removed release) reusing the
+history index from the previous write. Each result is compared with the same releases written
+from scratch in an empty directory. Exits with status 1 on the first mismatch.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_firefox_latest as firefox
+from generate_firefox_latest import HISTORY_FORMATS, all_history_entry, update_history_files
+
+NAME = "firefox_all_history"
+LAST_UPDATED = "January 01, 2026 09:00 AM EST"
+
+def date_of(info):
+    return info.get("date", "")
+
+def release(version, date, category="major"):
+    return {"version": version, "date": date, "category": category}
+
+def base_releases():
+    releases = {}
+    for major in range(120, 140):
+        releases[f"firefox-{major}.0"] = release(f"{major}.0", f"2025-{(major - 120) // 2 + 1:02d}-{(major % 2) * 14 + 1:02d}")
+        releases[f"firefox-{major}.0.1"] = release(f"{major}.0.1", f"2025-{(major - 120) // 2 + 1:02d}-{(major % 2) * 14 + 8:02d}", "stability")
+    return releases
+
+def write_sequence(root, steps):
+    """Write each items dict of steps in turn into one directory; returns (file contents, log of the last write)."""
+    output_dir = os.path.join(root, "out")
+    os.makedirs(output_dir)
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        for items in steps:
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                update_history_files(output_dir, NAME, items, all_history_entry, date_of)
+    finally:
+        os.chdir(cwd)
+    files = {}
+    for ext in HISTORY_FORMATS:
+        with open(os.path.join(output_dir, f"{NAME}.{ext}"), "rb") as f:
+            files[ext] = f.read()
+    return files, log.getvalue()
+
+def check(label, before, after, patched):
+    """Update before -> after and compare with after written in full; patched: whether the files should be patched in place."""
+    with tempfile.TemporaryDirectory() as incremental_root, tempfile.TemporaryDirectory() as full_root:
+        incremental, log = write_sequence(incremental_root, [before, after])
+        full, _ = write_sequence(full_root, [after])
+    problems = [f"{NAME}.{ext} differs from a full rebuild" for ext in HISTORY_FORMATS if incremental[ext] != full[ext]]
+    if ("updated in" in log) != patched:
+        problems.append("files were patched in place" if not patched else "files were rewritten instead of patched")
+    print(f"{label}: {'ok' if not problems else 'FAILED'}")
+    for problem in problems:
+        print(f"  {problem}")
+    return not problems
+
+def main():
+    firefox.get_last_updated_str = lambda: LAST_UPDATED
+    base = base_releases()
+
+    added = dict(base)
+    added["firefox-140.0"] = release("140.0", "2025-11-20")
+    added["firefox-125.0.2"] = release("125.0.2", "2025-03-20", "stability")
+
+    changed = dict(base)
+    changed["firefox-124.0.1"] = release("124.0.1", "2025-03-08", "dot")
+
+    redated = dict(added)
+    redated["firefox-130.0"] = release("130.0", "2025-06-02")
+
+    removed = dict(base)
+    del removed["firefox-131.0.1"]
+
+    results = [
+        check("new releases", base, added, patched=True),
+        check("existing release changed", base, changed, patched=False),
+        check("existing release redated", added, redated, patched=False),
+        check("release removed", base, removed, patched=False),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Check that the accelerated serializer backends produce byte-identical output to json.dumps / yaml.dump.
+
+Usage:
+    python .github/actions/verify_serializers.py [file.json|file.yaml ...]
+
+The data of every given file (by default every JSON file in the latest_*_files directories, plus
+the YAML files that have no JSON twin) and a set of random documents (odd strings, non-ASCII, control characters, big ints, exponent
+floats, NaN, nesting) are serialized through serializers.dump_json / dump_yaml with the
+accelerated backends forced on, and through the stdlib / pure-Python path.
+Exits with status 1 on the first mismatch.
+"""
+import glob
+import json
+import os
+import random
+import sys
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import serializers
+from serializers import dump_json, dump_yaml
+
+YAML_OPTIONS = [
+    {},
+    {"sort_keys": False},
+    {"default_flow_style": False, "sort_keys": False},
+    {"sort_keys": False, "allow_unicode": True},
+]
+# The output files are large; check them with the options the generators use
+FILE_YAML_OPTIONS = [{"sort_keys": False}, {"sort_keys": False, "allow_unicode": True}]
+
+PIECES = list("abc xyz:-#&*!|>'\"%@`{}[],?\n\t\\\r") + [
+    "\x85", "\xa0", "é", "日本", "\x7f", "\x00", "\x1b", "﻿", " ", "\U0001F600", "’",
+    "  ", "1e5", "0x1", "yes", "~", "null", "2024-01-01", "N/A", "120.0.6099.109", "word " * 20,
+]
+SCALARS = [0, 1, -5, 2 ** 53 + 1, 2 ** 63, 2 ** 64, 10 ** 30, 0.1, 1.5, -0.0, 1e16, 1e-7, 5e-324, 1e300,
+           123456789.123, float("nan"), float("inf"), True, False, None]
+
+def random_string(rng):
+    return "".join(rng.choice(PIECES) for _ in range(rng.randrange(12)))
+
+def random_value(rng, depth=0):
+    r = rng.random()
+    if depth < 3 and r < 0.15:
+        return {random_string(rng) or "key": random_value(rng, depth + 1) for _ in range(rng.randrange(4))}
+    if depth < 3 and r < 0.3:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    if r < 0.45:
+        return rng.choice(SCALARS)
+    return random_string(rng)
+
+def random_document(rng):
+    # Mostly plain records, like the history files, with the occasional odd value
+    plain = rng.random() < 0.5
+    def value():
+        return f"{rng.randrange(200)}.0.{rng.randrange(9999)}.{rng.randrange(300)}" if plain else random_value(rng)
+    return {"last_updated": "March 01, 2024 10:00 AM EST", "releases": [{"version": value(), "fraction": value()} for _ in range(rng.randrange(6))]}
+
+class Counter:
+    def __init__(self):
+        self.checked = 0
+        self.yaml_fast = 0
+
+def check(label, data, counter, yaml_options=YAML_OPTIONS):
+    expected = json.dumps(data, indent=2)
+    if dump_json(data, accelerated=True) != expected:
+        print(f"{label}: dump_json differs from json.dumps")
+        sys.exit(1)
+    for options in yaml_options:
+        expected = yaml.dump(data, Dumper=yaml.Dumper, **options)
+        if dump_yaml(data, accelerated=True, **options) != expected:
+            print(f"{label}: dump_yaml differs from yaml.dump with {options}")
+            sys.exit(1)
+        expected = yaml.dump(data, Dumper=yaml.SafeDumper, **options)
+        if dump_yaml(data, Dumper=yaml.SafeDumper, accelerated=True, **options) != expected:
+            print(f"{label}: dump_yaml differs from yaml.safe_dump with {options}")
+            sys.exit(1)
+    counter.yaml_fast += serializers.libyaml_safe(data)
+    counter.checked += 1
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f) if path.endswith(".json") else yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+def main():
+    print(f"orjson: {'yes' if serializers.orjson else 'not installed'}, libyaml: {'yes' if yaml.__with_libyaml__ else 'not available'}")
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    paths = sys.argv[1:]
+    if not paths:
+        json_paths = glob.glob(os.path.join(root_dir, "latest_*_files", "*.json"))
+        yaml_paths = [path for path in glob.glob(os.path.join(root_dir, "latest_*_files", "*.yaml")) if f"{path[:-len('.yaml')]}.json" not in json_paths]
+        paths = sorted(json_paths + yaml_paths)
+    counter = Counter()
+    for path in paths:
+        check(path, load(path), counter, FILE_YAML_OPTIONS)
+    rng = random.Random(0)
+    documents = 1000
+    for i in range(documents):
+        check(f"random document {i}", random_document(rng), counter)
+    print(f"Identical output for {len(paths)} files and {documents} random documents "
+          f"({counter.yaml_fast} of {counter.checked} eligible for libyaml)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Check that xml_writer.pretty_xml produces byte-identical output to the minidom prettification it replaced.
+
+Usage:
+    python .github/actions/verify_xml_writer.py [file.xml ...]
+
+Every given XML file (by default all XML files in the latest_*_files directories, except the
+RSS feeds, which use namespaces) is checked both as parsed and with whitespace-only text
+stripped, plus a set of randomly generated trees with mixed content, attributes, empty
+elements and characters that need escaping.
+Exits with status 1 on the first mismatch.
+"""
+import glob
+import os
+import random
+import sys
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from xml_writer import pretty_xml
+
+def minidom_pretty(root):
+    return minidom.parseString(ET.tostring(root, encoding="utf-8")).toprettyxml(indent="  ")
+
+def strip_whitespace(element):
+    for node in element.iter():
+        if node.text is not None and not node.text.strip():
+            node.text = None
+        if node.tail is not None and not node.tail.strip():
+            node.tail = None
+    return element
+
+TEXTS = ["", " ", "\n  ", "plain", "a & b", "<tag>", 'say "hi"', "x > y", "line\nbreak", "crlf\r\nend",
+         "lone\rcr", "tab\tbed", "naïve – ünïcødé", "https://example.com/?a=1&b=2", "   padded   "]
+
+def random_tree(rng, depth=0):
+    element = ET.Element(rng.choice(["a", "version", "release_date", "Item", "x-y", "ns_el"]))
+    for i in range(rng.randrange(3)):
+        element.set(f"attr{i}", rng.choice(TEXTS))
+    if rng.random() < 0.6:
+        element.text = rng.choice(TEXTS)
+    if depth < 4:
+        for _ in range(rng.randrange(4)):
+            child = random_tree(rng, depth + 1)
+            if rng.random() < 0.3:
+                child.tail = rng.choice(TEXTS)
+            element.append(child)
+    return element
+
+def check(label, root):
+    expected = minidom_pretty(root)
+    actual = pretty_xml(root)
+    if actual != expected:
+        for n, (a, e) in enumerate(zip(actual.splitlines(), expected.splitlines()), 1):
+            if a != e:
+                print(f"{label}: line {n} differs\n  minidom:    {e!r}\n  pretty_xml: {a!r}")
+                break
+        else:
+            print(f"{label}: output differs in length ({len(actual)} vs {len(expected)})")
+        sys.exit(1)
+
+def main():
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(root_dir, "latest_*_files", "*.xml")))
+    paths = [path for path in paths if not path.endswith("_rss.xml")]
+    for path in paths:
+        check(path, ET.parse(path).getroot())
+        check(f"{path} (stripped)", strip_whitespace(ET.parse(path).getroot()))
+    rng = random.Random(0)
+    trees = 2000
+    for i in range(trees):
+        check(f"random tree {i}", random_tree(rng))
+    print(f"pretty_xml matches minidom for {len(paths)} files and {trees} random trees")
+
+if __name__ == "__main__":
+    main()
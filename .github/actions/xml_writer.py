@@ -0,0 +1,70 @@
+import xml.etree.ElementTree as ET
+
+# Indenting XML serializer shared by the generators.
+# pretty_xml(root) returns exactly what minidom.parseString(ET.tostring(root)).toprettyxml(indent=indent)
+# did, but writes the ElementTree directly instead of serializing it, parsing it into a second
+# (minidom) tree and serializing that. verify_xml_writer.py checks the two stay byte-identical.
+# Namespaced ({uri}name) tags are not supported; the RSS feeds, which need them, use ET.write.
+
+XML_DECLARATION = '<?xml version="1.0" ?>\n'
+
+def _escape(text):
+    # minidom escapes text and attribute values alike
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;").replace(">", "&gt;")
+
+def _text(text):
+    # Line ends in text come back from an XML parser as "\n" (attribute values are escaped
+    # by ET.tostring, so they round-trip unchanged)
+    return _escape(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+def _write(parts, element, indent, addindent):
+    if element.tag[:1] == "{":
+        raise ValueError(f"pretty_xml does not support namespaced tags: {element.tag}")
+    parts.append(f"{indent}<{element.tag}")
+    for name, value in element.attrib.items():
+        parts.append(f' {name}="{_escape(value)}"')
+    # Child nodes as minidom sees them: text, then each child element followed by its tail
+    nodes = [element.text] if element.text else []
+    for child in element:
+        nodes.append(child)
+        if child.tail:
+            nodes.append(child.tail)
+    if not nodes:
+        parts.append("/>\n")
+        return
+    parts.append(">")
+    if len(nodes) == 1 and isinstance(nodes[0], str):
+        parts.append(_text(nodes[0]))
+    else:
+        parts.append("\n")
+        child_indent = indent + addindent
+        for node in nodes:
+            if isinstance(node, str):
+                parts.append(f"{child_indent}{_text(node)}\n")
+            else:
+                _write(parts, node, child_indent, addindent)
+        parts.append(indent)
+    parts.append(f"</{element.tag}>\n")
+
+def pretty_xml(root, indent="  "):
+    """
+    Serialize an ElementTree element as an indented XML document, one element per line.
+    """
+    if isinstance(root, ET.ElementTree):
+        root = root.getroot()
+    parts = [XML_DECLARATION]
+    _write(parts, root, "", indent)
+    return "".join(parts)
+
+def iter_pretty_xml(tag, children, indent="  "):
+    """
+    Yield pretty_xml() of a <tag> root holding children, one child at a time, so the whole
+    tree never has to exist at once. children is an iterable of elements without tails.
+    """
+    first = True
+    for child in children:
+        parts = [XML_DECLARATION, f"<{tag}>\n"] if first else []
+        first = False
+        _write(parts, child, indent, indent)
+        yield "".join(parts)
+    yield f"{XML_DECLARATION}<{tag}/>\n" if first else f"</{tag}>\n"